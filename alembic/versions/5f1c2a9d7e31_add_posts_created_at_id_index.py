@@ -0,0 +1,26 @@
+"""add posts created_at id index for feed pagination
+
+Revision ID: 5f1c2a9d7e31
+Revises: 44467217b81b
+Create Date: 2024-08-02 10:14:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c2a9d7e31'
+down_revision: Union[str, None] = '44467217b81b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backs the (created_at, id) keyset used by GET /post/list
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
@@ -0,0 +1,38 @@
+"""add likes, saves and comments counters to posts
+
+Revision ID: 8b3e6d41c0a2
+Revises: 5f1c2a9d7e31
+Create Date: 2024-08-03 16:42:05.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3e6d41c0a2'
+down_revision: Union[str, None] = '5f1c2a9d7e31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('likes_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('posts', sa.Column('saves_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('posts', sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill the counters from the existing rows
+    op.execute("""
+        UPDATE posts SET
+            likes_count = (SELECT count(*) FROM liked_posts WHERE liked_posts.post_id = posts.id),
+            saves_count = (SELECT count(*) FROM saved_posts WHERE saved_posts.post_id = posts.id),
+            comments_count = (SELECT count(*) FROM comments WHERE comments.post_id = posts.id)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'comments_count')
+    op.drop_column('posts', 'saves_count')
+    op.drop_column('posts', 'likes_count')
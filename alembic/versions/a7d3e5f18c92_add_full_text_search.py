@@ -0,0 +1,44 @@
+"""add full-text search over captions and comments
+
+Revision ID: a7d3e5f18c92
+Revises: f3b7c1d92a64
+Create Date: 2024-08-19 11:08:36.942175
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e5f18c92'
+down_revision: Union[str, None] = 'f3b7c1d92a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        # Local runs: an FTS5 table the app keeps in sync, filled from the existing rows
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, post_id UNINDEXED, comment_id UNINDEXED)")
+        op.execute("DELETE FROM search_index")
+        op.execute("INSERT INTO search_index (body, post_id, comment_id) SELECT caption, id, NULL FROM posts WHERE caption IS NOT NULL")
+        op.execute("INSERT INTO search_index (body, post_id, comment_id) SELECT content, post_id, id FROM comments WHERE content IS NOT NULL")
+        return
+
+    # Generated columns are computed for the existing rows and maintained by Postgres
+    op.execute("ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(caption, ''))) STORED")
+    op.execute("ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_comments_search_vector ON comments USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS search_index")
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_comments_search_vector")
+    op.execute("DROP INDEX IF EXISTS ix_posts_search_vector")
+    op.execute("ALTER TABLE comments DROP COLUMN IF EXISTS search_vector")
+    op.execute("ALTER TABLE posts DROP COLUMN IF EXISTS search_vector")
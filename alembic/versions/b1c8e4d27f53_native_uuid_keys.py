@@ -0,0 +1,82 @@
+"""store primary and foreign keys as native uuids
+
+Revision ID: b1c8e4d27f53
+Revises: a7d3e5f18c92
+Create Date: 2024-08-22 10:41:12.318064
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1c8e4d27f53'
+down_revision: Union[str, None] = 'a7d3e5f18c92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEY_COLUMNS = {
+    'users': ['id'],
+    'posts': ['id', 'user_id'],
+    'liked_posts': ['id', 'post_id', 'user_id'],
+    'saved_posts': ['id', 'post_id', 'user_id'],
+    'comments': ['id', 'post_id', 'user_id'],
+    'follows': ['follower_id', 'followee_id'],
+    'timelines': ['user_id', 'post_id', 'author_id'],
+}
+
+# (table, column, referenced table, ON DELETE). References to posts.id get
+# ON UPDATE CASCADE so scripts/rekey_ids.py can change a post id in one UPDATE.
+FOREIGN_KEYS = [
+    ('posts', 'user_id', 'users', None),
+    ('liked_posts', 'post_id', 'posts', None),
+    ('liked_posts', 'user_id', 'users', None),
+    ('saved_posts', 'post_id', 'posts', None),
+    ('saved_posts', 'user_id', 'users', None),
+    ('comments', 'post_id', 'posts', 'CASCADE'),
+    ('comments', 'user_id', 'users', 'CASCADE'),
+    ('follows', 'follower_id', 'users', None),
+    ('follows', 'followee_id', 'users', None),
+    ('timelines', 'user_id', 'users', None),
+    ('timelines', 'post_id', 'posts', None),
+    ('timelines', 'author_id', 'users', None),
+]
+
+
+def _foreign_keys(on_update_cascade):
+    for table, column, referenced, ondelete in FOREIGN_KEYS:
+        op.create_foreign_key(
+            f'{table}_{column}_fkey', table, referenced, [column], ['id'],
+            ondelete=ondelete,
+            onupdate='CASCADE' if on_update_cascade and referenced == 'posts' else None,
+        )
+
+
+def upgrade() -> None:
+    # SQLite has no uuid type: keys stay TEXT there, and UUIDv7 text sorts by time anyway
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # The existing uuid4 strings cast as they are. Each table is rewritten once
+    # under an exclusive lock, so run this in a quiet period on large tables.
+    for table, column, _, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey')
+    for table, columns in KEY_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(
+            f'ALTER COLUMN {column} TYPE uuid USING {column}::uuid' for column in columns
+        ))
+    _foreign_keys(on_update_cascade=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column, _, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey')
+    for table, columns in KEY_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(
+            f'ALTER COLUMN {column} TYPE text USING {column}::text' for column in columns
+        ))
+    _foreign_keys(on_update_cascade=False)
@@ -0,0 +1,64 @@
+"""add unique and lookup indexes for toggles, signin and comments
+
+Revision ID: c47a0f9e2b18
+Revises: 8b3e6d41c0a2
+Create Date: 2024-08-05 11:27:49.630512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a0f9e2b18'
+down_revision: Union[str, None] = '8b3e6d41c0a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_duplicate_emails():
+    # The old check-then-insert signup could race into two accounts with one
+    # email. Each owns its own posts and likes, so which to keep (or merge)
+    # is for an operator to decide, not this migration.
+    duplicates = op.get_bind().exec_driver_sql(
+        "SELECT email, count(*) FROM users GROUP BY email HAVING count(*) > 1 ORDER BY email"
+    ).all()
+    if duplicates:
+        listed = ", ".join(f"{email} ({count} accounts)" for email, count in duplicates)
+        raise RuntimeError(
+            f"users.email has duplicates, so ux_users_email cannot be created: {listed}. "
+            "Merge or rename these accounts, then run the migration again."
+        )
+
+
+def upgrade() -> None:
+    # Drop duplicate likes/saves left behind by racing toggles, keeping one row
+    # per (user_id, post_id), so the unique indexes can be built
+    for table in ('liked_posts', 'saved_posts'):
+        op.execute(f"""
+            DELETE FROM {table} WHERE id NOT IN (
+                SELECT min(id) FROM {table} GROUP BY user_id, post_id
+            )
+        """)
+
+    # The counters were backfilled including those duplicates
+    op.execute("""
+        UPDATE posts SET
+            likes_count = (SELECT count(*) FROM liked_posts WHERE liked_posts.post_id = posts.id),
+            saves_count = (SELECT count(*) FROM saved_posts WHERE saved_posts.post_id = posts.id)
+    """)
+
+    op.create_index('ux_liked_posts_user_id_post_id', 'liked_posts', ['user_id', 'post_id'], unique=True)
+    op.create_index('ux_saved_posts_user_id_post_id', 'saved_posts', ['user_id', 'post_id'], unique=True)
+    _check_duplicate_emails()
+    op.create_index('ux_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at'], unique=False)
+    # posts(created_at, id) already exists as ix_posts_created_at_id (5f1c2a9d7e31)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_post_id_created_at', table_name='comments')
+    op.drop_index('ux_users_email', table_name='users')
+    op.drop_index('ux_saved_posts_user_id_post_id', table_name='saved_posts')
+    op.drop_index('ux_liked_posts_user_id_post_id', table_name='liked_posts')
@@ -0,0 +1,29 @@
+"""add per-user indexes for profile counts and paginated lists
+
+Revision ID: c5e9a1f04b37
+Revises: b1c8e4d27f53
+Create Date: 2024-08-26 09:12:54.602817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a1f04b37'
+down_revision: Union[str, None] = 'b1c8e4d27f53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_liked_posts_user_id_created_at_id', 'liked_posts', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_saved_posts_user_id_created_at_id', 'saved_posts', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_posts_user_id_created_at_id', 'posts', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_user_id_created_at_id', table_name='posts')
+    op.drop_index('ix_saved_posts_user_id_created_at_id', table_name='saved_posts')
+    op.drop_index('ix_liked_posts_user_id_created_at_id', table_name='liked_posts')
@@ -0,0 +1,29 @@
+"""add claimed_at to posts so pending uploads can be reclaimed
+
+Revision ID: d8f2b6a41e90
+Revises: c5e9a1f04b37
+Create Date: 2024-08-28 14:20:37.915406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f2b6a41e90'
+down_revision: Union[str, None] = 'c5e9a1f04b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+    # Posts pending right now count as claimed when they were created, so the
+    # running processes keep them and the sweep only takes over abandoned ones
+    op.execute("UPDATE posts SET claimed_at = created_at WHERE status = 'pending'")
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'claimed_at')
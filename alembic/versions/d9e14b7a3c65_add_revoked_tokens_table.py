@@ -0,0 +1,37 @@
+"""add revoked_tokens table
+
+Revision ID: d9e14b7a3c65
+Revises: c47a0f9e2b18
+Create Date: 2024-08-09 14:03:21.887410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9e14b7a3c65'
+down_revision: Union[str, None] = 'c47a0f9e2b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's create_all may already have created it on a fresh database
+    if sa.inspect(op.get_bind()).has_table('revoked_tokens'):
+        return
+
+    op.create_table('revoked_tokens',
+    sa.Column('jti', sa.TEXT(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('jti', name='revoked_tokens_pkey')
+    )
+    op.create_index('ix_revoked_tokens_created_at', 'revoked_tokens', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revoked_tokens_created_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
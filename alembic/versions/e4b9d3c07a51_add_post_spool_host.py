@@ -0,0 +1,27 @@
+"""add spool_host to posts so only the spooling host fails a lost upload
+
+Revision ID: e4b9d3c07a51
+Revises: d8f2b6a41e90
+Create Date: 2024-09-02 10:12:48.503921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9d3c07a51'
+down_revision: Union[str, None] = 'd8f2b6a41e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Left empty on existing rows: their host is unknown, so any host sweeps them as before
+    op.add_column('posts', sa.Column('spool_host', sa.VARCHAR(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'spool_host')
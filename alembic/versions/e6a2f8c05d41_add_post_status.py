@@ -0,0 +1,27 @@
+"""add status to posts for background image uploads
+
+Revision ID: e6a2f8c05d41
+Revises: d9e14b7a3c65
+Create Date: 2024-08-12 09:55:12.204736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a2f8c05d41'
+down_revision: Union[str, None] = 'd9e14b7a3c65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Every existing post already has its image uploaded
+    op.add_column('posts', sa.Column('status', sa.VARCHAR(length=16), nullable=False, server_default='ready'))
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'status')
@@ -0,0 +1,59 @@
+"""add follow graph and materialized home timelines
+
+Revision ID: f3b7c1d92a64
+Revises: e6a2f8c05d41
+Create Date: 2024-08-14 16:20:47.531902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7c1d92a64'
+down_revision: Union[str, None] = 'e6a2f8c05d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('following_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # The app's create_all may already have created them on a fresh database
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('follows'):
+        op.create_table('follows',
+        sa.Column('follower_id', sa.TEXT(), nullable=False),
+        sa.Column('followee_id', sa.TEXT(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['follower_id'], ['users.id'], name='follows_follower_id_fkey'),
+        sa.ForeignKeyConstraint(['followee_id'], ['users.id'], name='follows_followee_id_fkey'),
+        sa.PrimaryKeyConstraint('follower_id', 'followee_id', name='follows_pkey')
+        )
+        op.create_index('ix_follows_followee_id_follower_id', 'follows', ['followee_id', 'follower_id'], unique=False)
+
+    if not inspector.has_table('timelines'):
+        op.create_table('timelines',
+        sa.Column('user_id', sa.TEXT(), nullable=False),
+        sa.Column('post_id', sa.TEXT(), nullable=False),
+        sa.Column('author_id', sa.TEXT(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='timelines_user_id_fkey'),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], name='timelines_post_id_fkey'),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], name='timelines_author_id_fkey'),
+        sa.PrimaryKeyConstraint('user_id', 'post_id', name='timelines_pkey')
+        )
+        op.create_index('ix_timelines_user_id_created_at_post_id', 'timelines', ['user_id', 'created_at', 'post_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timelines_user_id_created_at_post_id', table_name='timelines')
+    op.drop_table('timelines')
+    op.drop_index('ix_follows_followee_id_follower_id', table_name='follows')
+    op.drop_table('follows')
+    op.drop_column('users', 'following_count')
+    op.drop_column('users', 'followers_count')
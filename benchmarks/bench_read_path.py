@@ -0,0 +1,209 @@
+"""Compare ORM and column-level (services.reads) reads of the list endpoints.
+
+    python -m benchmarks.bench_read_path [--rows 1000] [--repeat 10] [--url sqlite:///bench_read.db]
+
+Seeds --rows liked posts and --rows comments on one post into a scratch
+database (a temporary SQLite file unless --url is given; the tables are
+created and the rows added on every run, so point it at an empty database),
+then builds the response dicts of /post/list/liked, the feed fragments and
+/post/{post_id}/comments both ways:
+
+- `orm`: the previous code, ORM entities with joinedload relationships
+- `core`: `select(...)` of just the response columns, Row to dict
+
+Reported per 1,000 rows: best CPU time (`time.process_time`) over --repeat
+runs, and the peak Python allocation seen by tracemalloc during one run.
+Every run uses a fresh session, as a request would.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from db import async_url
+from models.base_model import Base
+from models.comment_model import CommentModel
+from models.liked_model import LikedModel
+from models.post_model import Post
+from models.user_model import UserModel
+# Not read here, but the mappers must all be configured
+import models.follow_model  # noqa: F401
+import models.revoked_token_model  # noqa: F401
+import models.saved_model  # noqa: F401
+import models.timeline_model  # noqa: F401
+from services.ids import id_at, new_id
+from services.reads import COMMENT_COLUMNS, POST_SUMMARY_COLUMNS, comment_dict, post_fragment, post_summary, select_posts
+
+AUTHORS = 50
+
+
+async def seed(engine, rows):
+    now = datetime.now(timezone.utc)
+    viewer = new_id()
+    authors = [new_id() for _ in range(AUTHORS)]
+    users = [{"id": user_id, "username": f"user{i}", "email": f"user{i}@bench.local", "password": b"x"}
+             for i, user_id in enumerate([viewer, *authors])]
+    posts = [{
+        "id": id_at(now - timedelta(minutes=i), i),
+        "user_id": authors[i % AUTHORS],
+        "image_url": f"https://res.cloudinary.com/demo/image/upload/posts/{i}.jpg",
+        "caption": "caption " * 8,
+        "status": "ready",
+        "created_at": now - timedelta(minutes=i),
+    } for i in range(rows)]
+    likes = [{"id": id_at(now - timedelta(seconds=i), i), "user_id": viewer, "post_id": post["id"],
+              "created_at": now - timedelta(seconds=i)} for i, post in enumerate(posts)]
+    comments = [{"id": id_at(now - timedelta(seconds=i), i), "post_id": posts[0]["id"],
+                 "user_id": authors[i % AUTHORS], "content": "nice picture " * 3,
+                 "created_at": now - timedelta(seconds=i)} for i in range(rows)]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for model, values in ((UserModel, users), (Post, posts), (LikedModel, likes), (CommentModel, comments)):
+            await conn.execute(insert(model), values)
+    return viewer, [post["id"] for post in posts], posts[0]["id"]
+
+
+def orm_user_dict(user):
+    return {"id": user.id, "username": user.username, "email": user.email}
+
+
+async def liked_orm(db, viewer, post_ids, post_id):
+    rows = (await db.execute(
+        select(LikedModel).where(LikedModel.user_id == viewer)
+        .options(joinedload(LikedModel.post).joinedload(Post.user))
+        .order_by(LikedModel.created_at.desc(), LikedModel.id.desc())
+    )).scalars().all()
+    return [{
+        "id": row.post.id,
+        "image_url": row.post.image_url,
+        "caption": row.post.caption,
+        "created_at": row.post.created_at,
+        "updated_at": row.post.updated_at,
+        "liked_by_user": True,
+        "saved_by_user": False,
+        "user": orm_user_dict(row.post.user),
+    } for row in rows]
+
+
+async def liked_core(db, viewer, post_ids, post_id):
+    rows = (await db.execute(
+        select(LikedModel.id.label("entry_id"), LikedModel.created_at.label("entry_created_at"),
+               *POST_SUMMARY_COLUMNS)
+        .join(Post, Post.id == LikedModel.post_id)
+        .join(UserModel, UserModel.id == Post.user_id)
+        .where(LikedModel.user_id == viewer)
+        .order_by(LikedModel.created_at.desc(), LikedModel.id.desc())
+    )).all()
+    liked_ids = {row.id for row in rows}
+    return [post_summary(row, liked_ids, set()) for row in rows]
+
+
+async def fragments_orm(db, viewer, post_ids, post_id):
+    posts = (await db.execute(
+        select(Post).where(Post.id.in_(post_ids)).options(joinedload(Post.user))
+    )).scalars().all()
+    return [{
+        "id": post.id,
+        "image_url": post.image_url,
+        "caption": post.caption,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at,
+        "likes_count": post.likes_count,
+        "saves_count": post.saves_count,
+        "comments_count": post.comments_count,
+        "comments": [],
+        "user": orm_user_dict(post.user),
+    } for post in posts]
+
+
+async def fragments_core(db, viewer, post_ids, post_id):
+    rows = (await db.execute(select_posts().where(Post.id.in_(post_ids)))).all()
+    return [post_fragment(row, []) for row in rows]
+
+
+async def comments_orm(db, viewer, post_ids, post_id):
+    comments = (await db.execute(
+        select(CommentModel).where(CommentModel.post_id == post_id)
+        .options(joinedload(CommentModel.user))
+        .order_by(CommentModel.created_at.desc(), CommentModel.id.desc())
+    )).scalars().all()
+    return [{
+        "id": comment.id,
+        "content": comment.content,
+        "created_at": comment.created_at,
+        "updated_at": comment.updated_at,
+        "user": orm_user_dict(comment.user),
+    } for comment in comments]
+
+
+async def comments_core(db, viewer, post_ids, post_id):
+    rows = (await db.execute(
+        select(*COMMENT_COLUMNS).join(UserModel, UserModel.id == CommentModel.user_id)
+        .where(CommentModel.post_id == post_id)
+        .order_by(CommentModel.created_at.desc(), CommentModel.id.desc())
+    )).all()
+    return [comment_dict(row) for row in rows]
+
+
+CASES = {
+    "liked list": (liked_orm, liked_core),
+    "feed fragments": (fragments_orm, fragments_core),
+    "comments": (comments_orm, comments_core),
+}
+
+
+async def run_once(sessionmaker, fn, args):
+    async with sessionmaker() as db:
+        return await fn(db, *args)
+
+
+async def measure(sessionmaker, fn, args, repeat):
+    cpu = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        await run_once(sessionmaker, fn, args)
+        cpu = min(cpu, time.process_time() - started)
+
+    tracemalloc.start()
+    await run_once(sessionmaker, fn, args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+async def main(args):
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_read.db")
+    engine = create_async_engine(async_url(url))
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    viewer, post_ids, post_id = await seed(engine, args.rows)
+    case_args = (viewer, post_ids, post_id)
+    per_1000 = 1000 / args.rows
+
+    print(f"{args.rows} rows, best of {args.repeat}; per 1,000 rows:")
+    print(f"{'':>16} {'orm cpu':>10} {'core cpu':>10} {'speedup':>8} {'orm peak':>10} {'core peak':>10} {'ratio':>7}")
+    for name, (orm, core) in CASES.items():
+        # Same response both ways, or the comparison is meaningless
+        assert await run_once(sessionmaker, orm, case_args) == await run_once(sessionmaker, core, case_args)
+        orm_cpu, orm_peak = await measure(sessionmaker, orm, case_args, args.repeat)
+        core_cpu, core_peak = await measure(sessionmaker, core, case_args, args.repeat)
+        print(f"{name:>16} {orm_cpu * 1000 * per_1000:8.2f}ms {core_cpu * 1000 * per_1000:8.2f}ms "
+              f"{orm_cpu / core_cpu:7.1f}x {orm_peak / 1024 * per_1000:8.0f}KB {core_peak / 1024 * per_1000:8.0f}KB "
+              f"{orm_peak / core_peak:6.1f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--url", help="empty database to use instead of a temporary SQLite file")
+    asyncio.run(main(parser.parse_args()))
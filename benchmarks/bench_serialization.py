@@ -0,0 +1,79 @@
+"""Compare feed serialization paths on a 500-post page.
+
+    python -m benchmarks.bench_serialization [--posts 500] [--comments 5] [--repeat 20]
+
+`jsonable_encoder` is what FastAPI runs on a plain dict return value before
+`json.dumps`; `orjson` is the ORJSONResponse path used by the feed routes.
+"""
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from services.responses import ORJSONResponse
+
+
+def make_page(posts, comments):
+    now = datetime.now(timezone.utc)
+
+    def user():
+        return {"id": str(uuid.uuid4()), "username": "someone", "email": "someone@example.com"}
+
+    page = []
+    for i in range(posts):
+        page.append({
+            "id": str(uuid.uuid4()),
+            "image_url": f"https://res.cloudinary.com/demo/image/upload/posts/{i}.jpg",
+            "caption": "caption " * 8,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": None,
+            "liked_by_user": i % 3 == 0,
+            "saved_by_user": i % 5 == 0,
+            "likes_count": i * 7,
+            "saves_count": i,
+            "comments_count": comments,
+            "comments": [{
+                "id": str(uuid.uuid4()),
+                "content": "nice picture " * 3,
+                "created_at": now - timedelta(seconds=j),
+                "updated_at": None,
+                "user": user(),
+            } for j in range(comments)],
+            "user": user(),
+        })
+    return page
+
+
+def default_path(page):
+    return json.dumps(jsonable_encoder(page), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def orjson_path(page):
+    return ORJSONResponse(page).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--comments", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    page = make_page(args.posts, args.comments)
+    assert orjson.loads(default_path(page)) == orjson.loads(orjson_path(page))
+
+    results = {}
+    for name, fn in (("jsonable_encoder+json", default_path), ("orjson", orjson_path)):
+        best = min(timeit.repeat(lambda: fn(page), number=1, repeat=args.repeat))
+        results[name] = best * 1000
+        print(f"{name:>22}: {best * 1000:8.2f} ms per page")
+
+    print(f"{'speedup':>22}: {results['jsonable_encoder+json'] / results['orjson']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
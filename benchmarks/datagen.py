@@ -0,0 +1,206 @@
+"""Bulk-load a synthetic data set with skewed popularity for the benchmarks.
+
+    python -m benchmarks.datagen [--users 1000] [--posts 10000] [--likes 100000]
+        [--saves 20000] [--comments 30000] [--zipf 1.1] [--seed 42] [--create-schema]
+
+Uses BASE_URL like the app (SQLite or a local Postgres). Which posts get
+liked, saved and commented on, and which users author posts, follows a
+Zipf distribution with exponent --zipf, so a few posts and users get most
+of the activity, as on the real feed. Rows go in with multi-row INSERTs
+in --batch sized chunks, or with COPY on Postgres. The denormalized
+counters are written consistent with the generated rows.
+
+Every user signs in as `user<i>@bench.local` with --password, hashed once
+at the current BCRYPT_ROUNDS so logins do not trigger a rehash. The same
+--seed always produces the same data set.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import bcrypt
+from sqlalchemy import insert, text
+
+from db import dispose_engine, get_engine
+from models.comment_model import CommentModel
+from models.liked_model import LikedModel
+from models.post_model import Post
+from models.saved_model import SavedModel
+from models.user_model import UserModel
+# Not loaded here, but --create-schema must create their tables too
+import models.follow_model  # noqa: F401
+import models.revoked_token_model  # noqa: F401
+import models.timeline_model  # noqa: F401
+from services.ids import id_at
+from services.passwords import BCRYPT_ROUNDS
+from services.schema import create_schema
+from services.search import SQLITE_BACKFILL
+
+EMAIL = "user{}@bench.local"
+
+
+def zipf_weights(n, s):
+    # Rank i (1-based) is drawn with probability proportional to 1 / i^s
+    return list(itertools.accumulate(1 / (i ** s) for i in range(1, n + 1)))
+
+
+def pick_pairs(rng, count, users, posts, cum_weights):
+    """`count` distinct (user, post) pairs; users uniform, posts by popularity."""
+    count = min(count, len(users) * len(posts))
+    pairs = set()
+    while len(pairs) < count:
+        for post in rng.choices(posts, cum_weights=cum_weights, k=count - len(pairs)):
+            pairs.add((rng.choice(users), post))
+    return pairs
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    since = timedelta(days=args.days).total_seconds()
+
+    def moment():
+        return now - timedelta(seconds=rng.uniform(0, since))
+
+    password = bcrypt.hashpw(args.password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS))
+    user_ids = [id_at(moment(), rng.getrandbits(74)) for _ in range(args.users)]
+    users = [{
+        "id": user_id,
+        "username": f"user{i}",
+        "email": EMAIL.format(i),
+        "password": password,
+        "followers_count": 0,
+        "following_count": 0,
+    } for i, user_id in enumerate(user_ids)]
+
+    authors = rng.choices(user_ids, cum_weights=zipf_weights(len(user_ids), args.zipf), k=args.posts)
+    posts = []
+    for i, author in enumerate(authors):
+        created_at = moment()
+        posts.append({
+            "id": id_at(created_at, rng.getrandbits(74)),
+            "image_url": f"https://example.com/bench/{i}.jpg",
+            "caption": " ".join(rng.choices(WORDS, k=rng.randint(3, 12))),
+            "user_id": author,
+            "created_at": created_at,
+            "status": "ready",
+        })
+    post_ids = [post["id"] for post in posts]
+    # Popularity is independent of age: shuffle which posts are the hot ones
+    by_popularity = post_ids[:]
+    rng.shuffle(by_popularity)
+    weights = zipf_weights(len(by_popularity), args.zipf)
+
+    def row(**values):
+        # Time-ordered ids, like the ones the app creates
+        created_at = moment()
+        return {"id": id_at(created_at, rng.getrandbits(74)), "created_at": created_at, **values}
+
+    def relation(pairs):
+        return [row(user_id=user_id, post_id=post_id) for user_id, post_id in sorted(pairs)]
+
+    likes = relation(pick_pairs(rng, args.likes, user_ids, by_popularity, weights))
+    saves = relation(pick_pairs(rng, args.saves, user_ids, by_popularity, weights))
+    comments = [row(
+        post_id=post_id,
+        user_id=rng.choice(user_ids),
+        content=" ".join(rng.choices(WORDS, k=rng.randint(2, 20))),
+    ) for post_id in rng.choices(by_popularity, cum_weights=weights, k=args.comments)]
+
+    likes_count = Counter(row["post_id"] for row in likes)
+    saves_count = Counter(row["post_id"] for row in saves)
+    comments_count = Counter(row["post_id"] for row in comments)
+    for post in posts:
+        post["likes_count"] = likes_count[post["id"]]
+        post["saves_count"] = saves_count[post["id"]]
+        post["comments_count"] = comments_count[post["id"]]
+
+    return [(UserModel, users), (Post, posts), (LikedModel, likes), (SavedModel, saves), (CommentModel, comments)]
+
+
+async def copy_rows(conn, model, rows):
+    # asyncpg's COPY ... FROM STDIN, binary protocol
+    raw = await conn.get_raw_connection()
+    columns = list(rows[0])
+    await raw.driver_connection.copy_records_to_table(
+        model.__tablename__, records=[tuple(row[column] for column in columns) for row in rows], columns=columns
+    )
+
+
+async def insert_rows(conn, model, rows, batch):
+    for start in range(0, len(rows), batch):
+        await conn.execute(insert(model), rows[start:start + batch])
+
+
+async def load(args):
+    engine = get_engine()
+    if args.create_schema:
+        await create_schema(engine)
+
+    tables = generate(args)
+    timings = {}
+    async with engine.begin() as conn:
+        for model, rows in tables:
+            started = time.perf_counter()
+            if rows and conn.dialect.name == "postgresql" and not args.no_copy:
+                await copy_rows(conn, model, rows)
+            elif rows:
+                await insert_rows(conn, model, rows, args.batch)
+            timings[model.__tablename__] = {"rows": len(rows), "seconds": round(time.perf_counter() - started, 3)}
+
+        # The FTS5 fallback is maintained by the app, not by the database
+        if conn.dialect.name == "sqlite" and (await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+        )).first():
+            await conn.execute(text("DELETE FROM search_index"))
+            for backfill in SQLITE_BACKFILL:
+                await conn.execute(text(backfill))
+
+    await dispose_engine()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--likes", type=int, default=100000)
+    parser.add_argument("--saves", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=30000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew exponent")
+    parser.add_argument("--days", type=int, default=30, help="spread of created_at")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=5000, help="rows per INSERT")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--no-copy", action="store_true", help="use INSERT on Postgres too")
+    parser.add_argument("--create-schema", action="store_true", help="create_all first, for a fresh database")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    timings = asyncio.run(load(args))
+    print(json.dumps({
+        "seed": args.seed,
+        "zipf": args.zipf,
+        "tables": timings,
+        "seconds": round(time.perf_counter() - started, 3),
+    }, indent=2))
+
+
+WORDS = (
+    "sunset beach coffee morning city night street food travel mountain lake friends family "
+    "weekend music concert art museum garden rain snow autumn spring summer winter dog cat "
+    "birthday wedding holiday road trip bike run gym book cinema market sea river forest"
+).split()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""In-process load test of the auth, post and user routes.
+
+    python -m benchmarks.harness [--requests 200] [--concurrency 10] [--only list,signin]
+        [--users 50] [--output results.json]
+
+Runs against the database in BASE_URL, loaded with benchmarks.datagen
+first. The app runs in this process, including its lifespan, behind
+httpx's ASGI transport, so the numbers measure the app and its SQL, not
+a network or a server. Every scenario sends --requests requests with
+--concurrency of them in flight at a time.
+
+The JSON report has one entry per scenario:
+- p50/p95/p99/max latency in milliseconds
+- throughput in requests per second
+- the status codes seen
+- SQL statements per request, counted by the app's metrics middleware
+It also records the process's peak RSS and enough metadata (commit,
+database, settings) to compare runs across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The upload scenario must not reach a real storage service
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "bench-media"))
+os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "bench-spool"))
+
+import httpx
+
+from benchmarks.datagen import EMAIL
+from services.metrics import metrics
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"\0" * 1024
+
+
+class Context:
+    """State shared by the scenarios: signed-in users and ids to act on."""
+
+    def __init__(self, client, tokens, user_ids, post_ids):
+        self.client = client
+        self.tokens = tokens
+        self.user_ids = user_ids
+        self.post_ids = post_ids
+        self.comment_ids = []
+        self.signout_tokens = []
+        self.n = 0
+
+    def next(self):
+        self.n += 1
+        return self.n
+
+    def auth(self):
+        return {"x-auth-token": self.tokens[self.n % len(self.tokens)]}
+
+    def post_id(self):
+        # The front of the feed is what gets the traffic
+        return self.post_ids[self.n % min(len(self.post_ids), 20)]
+
+
+async def signup(ctx):
+    email = f"bench-{uuid.uuid4().hex}@bench.local"
+    return await ctx.client.post("/auth/signup", json={"username": "bench", "email": email, "password": "password"})
+
+
+async def signin(ctx):
+    email = EMAIL.format(ctx.next() % len(ctx.tokens))
+    return await ctx.client.post("/auth/signin", json={"email": email, "password": ctx.password})
+
+
+async def me(ctx):
+    ctx.next()
+    return await ctx.client.get("/auth/me", headers=ctx.auth())
+
+
+async def signout(ctx):
+    return await ctx.client.post("/auth/signout", headers={"x-auth-token": ctx.signout_tokens.pop()})
+
+
+async def list_posts(ctx):
+    ctx.next()
+    return await ctx.client.get("/post/list", headers=ctx.auth())
+
+
+async def list_posts_deep(ctx):
+    # Follow the cursor a few pages down, as infinite scroll does
+    ctx.next()
+    response = await ctx.client.get("/post/list", headers=ctx.auth())
+    for _ in range(3):
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        response = await ctx.client.get("/post/list", params={"cursor": cursor}, headers=ctx.auth())
+    return response
+
+
+async def timeline(ctx):
+    ctx.next()
+    return await ctx.client.get("/post/timeline", headers=ctx.auth())
+
+
+async def search(ctx):
+    ctx.next()
+    return await ctx.client.get("/post/search", params={"q": "coffee"}, headers=ctx.auth())
+
+
+async def like(ctx):
+    ctx.next()
+    return await ctx.client.post("/post/liked", json={"post_id": ctx.post_id()}, headers=ctx.auth())
+
+
+async def like_batch(ctx):
+    ctx.next()
+    items = [{"post_id": post_id, "action": "add" if ctx.n % 2 else "remove"} for post_id in ctx.post_ids[:20]]
+    return await ctx.client.post("/post/liked/batch", json={"items": items}, headers=ctx.auth())
+
+
+async def save(ctx):
+    ctx.next()
+    return await ctx.client.post("/post/saved", json={"post_id": ctx.post_id()}, headers=ctx.auth())
+
+
+async def save_batch(ctx):
+    ctx.next()
+    items = [{"post_id": post_id, "action": "add" if ctx.n % 2 else "remove"} for post_id in ctx.post_ids[:20]]
+    return await ctx.client.post("/post/saved/batch", json={"items": items}, headers=ctx.auth())
+
+
+async def list_liked(ctx):
+    ctx.next()
+    return await ctx.client.get("/post/list/liked", headers=ctx.auth())
+
+
+async def list_saved(ctx):
+    ctx.next()
+    return await ctx.client.get("/post/list/saved", headers=ctx.auth())
+
+
+async def create_comment(ctx):
+    ctx.next()
+    headers = ctx.auth()
+    response = await ctx.client.post("/post/comments", json={"post_id": ctx.post_id(), "content": "benchmark comment"},
+                                     headers=headers)
+    if response.status_code == 200:
+        ctx.comment_ids.append((response.json()["id"], headers))
+    return response
+
+
+async def list_comments(ctx):
+    ctx.next()
+    return await ctx.client.get(f"/post/{ctx.post_id()}/comments", headers=ctx.auth())
+
+
+async def delete_comment(ctx):
+    comment_id, headers = ctx.comment_ids.pop()
+    return await ctx.client.delete(f"/post/comments/{comment_id}", headers=headers)
+
+
+async def upload(ctx):
+    ctx.next()
+    return await ctx.client.post("/post/upload", files={"image_url": ("bench.png", IMAGE, "image/png")},
+                                 data={"caption": "benchmark upload"}, headers=ctx.auth())
+
+
+async def follow(ctx):
+    ctx.next()
+    # Someone other than the signed-in user, who is tokens[n % len]
+    followee = ctx.user_ids[(ctx.n + 1) % len(ctx.user_ids)]
+    return await ctx.client.post(f"/user/{followee}/follow", headers=ctx.auth())
+
+
+# Order matters: delete_comment removes what create_comment made, signout
+# uses tokens prepared beforehand
+SCENARIOS = {
+    "signup": signup,
+    "signin": signin,
+    "me": me,
+    "list": list_posts,
+    "list_deep": list_posts_deep,
+    "timeline": timeline,
+    "search": search,
+    "like": like,
+    "like_batch": like_batch,
+    "save": save,
+    "save_batch": save_batch,
+    "list_liked": list_liked,
+    "list_saved": list_saved,
+    "create_comment": create_comment,
+    "list_comments": list_comments,
+    "delete_comment": delete_comment,
+    "upload": upload,
+    "follow": follow,
+    "signout": signout,
+}
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def request_statements():
+    return sum(n for (_, route), n in metrics.statements.items() if route != "background")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_scenario(ctx, scenario, requests, concurrency):
+    latencies = []
+    statuses = Counter()
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            response = await scenario(ctx)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    statements = request_statements()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    statements = request_statements() - statements
+
+    latencies.sort()
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(ms[-1], 2),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "sql_per_request": round(statements / len(latencies), 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def prepare(client, args):
+    """Sign in --users benchmark users and collect post and user ids (not measured)."""
+    signed_in = []
+    # One at a time: a burst of logins would fill the hashing queue and get 503s
+    for i in range(args.users):
+        response = await client.post("/auth/signin", json={"email": EMAIL.format(i), "password": args.password})
+        response.raise_for_status()
+        signed_in.append(response.json())
+    tokens = [user["token"] for user in signed_in]
+    user_ids = [user["user"]["id"] for user in signed_in]
+
+    response = await client.get("/post/list", params={"limit": 100}, headers={"x-auth-token": tokens[0]})
+    response.raise_for_status()
+    post_ids = [post["id"] for post in response.json()]
+    if not post_ids:
+        raise SystemExit("No posts in the database; run benchmarks.datagen first")
+
+    ctx = Context(client, tokens, user_ids, post_ids)
+    ctx.password = args.password
+    return ctx
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    from db import get_engine
+
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "database": get_engine().dialect.name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "settings": {name: os.getenv(name) for name in (
+            "BCRYPT_ROUNDS", "FEED_CACHE_BACKEND", "LIKE_WRITE_BEHIND", "DB_POOL_SIZE", "DB_MAX_OVERFLOW",
+        )},
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+async def run(args):
+    from main import create_app
+
+    app = create_app()
+    selected = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    meta = metadata(args)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            ctx = await prepare(client, args)
+            for name in SCENARIOS:
+                if name not in selected:
+                    continue
+                requests = args.requests
+                if name == "signout":
+                    ctx.signout_tokens = [(await signin(ctx)).json()["token"] for _ in range(requests)]
+                if name == "delete_comment":
+                    requests = min(requests, len(ctx.comment_ids))
+                if requests:
+                    results[name] = await run_scenario(ctx, SCENARIOS[name], requests, args.concurrency)
+                    print(f"{name:>15}: {results[name]['p50_ms']:8.2f} ms p50 "
+                          f"{results[name]['throughput_rps']:8.1f} req/s", file=sys.stderr)
+
+    return {"meta": meta, "scenarios": results, "peak_rss_mb": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50, help="benchmark users signed in up front")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--only", help="comma separated scenario names")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
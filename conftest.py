@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+# The app reads its settings once, on import: a throwaway setup for the tests
+os.environ.setdefault("PASSWORD_KEY", "test-secret")
+os.environ.setdefault("AUTO_CREATE_SCHEMA", "true")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+
+from services import profiler  # noqa: E402
+
+
+def reset(monkeypatch, singleton, fresh):
+    """Give a process-wide `singleton` the state of `fresh` for one test."""
+    for name, value in vars(fresh).items():
+        monkeypatch.setattr(singleton, name, value)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A TestClient on the app, with its lifespan, over an empty SQLite database.
+
+    The caches, buffers and workers living in module globals start empty
+    too, so nothing a previous test left behind is served from them.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+    from middleware.auth_middleware import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL, token_cache
+    from services import storage, upload_worker
+    from services.fanout import FanoutWorker, fanout_worker
+    from services.feed_cache import FEED_CACHE_SIZE, FEED_CACHE_TTL, FeedCache, MemoryBackend, feed_cache
+    from services.like_buffer import LikeBuffer, like_buffer
+    from services.lru import TTLCache
+    from services.replicas import ReplicaSet, replicas
+    from services.revocation import RevocationList, revocations
+
+    monkeypatch.setenv("BASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("LOCAL_STORAGE_DIR", str(tmp_path / "media"))
+    monkeypatch.setattr(upload_worker, "UPLOAD_SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setattr(storage, "_storage", None)
+    reset(monkeypatch, feed_cache, FeedCache(MemoryBackend(FEED_CACHE_SIZE, FEED_CACHE_TTL)))
+    reset(monkeypatch, token_cache, TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL))
+    reset(monkeypatch, revocations, RevocationList())
+    reset(monkeypatch, like_buffer, LikeBuffer())
+    reset(monkeypatch, replicas, ReplicaSet())
+    reset(monkeypatch, fanout_worker, FanoutWorker())
+    reset(monkeypatch, upload_worker.upload_worker, upload_worker.UploadWorker())
+    with TestClient(main.create_app()) as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(client):
+    """Sign up `name`: returns its `id` and the `headers` to act as it."""
+    def sign_up(name):
+        credentials = {"username": name, "email": f"{name}@example.com", "password": "password"}
+        user_id = client.post("/auth/signup", json=credentials).json()["id"]
+        token = client.post("/auth/signin", json={"email": credentials["email"],
+                                                  "password": credentials["password"]}).json()["token"]
+        return {"id": user_id, "headers": {"x-auth-token": token}}
+
+    return sign_up
+
+
+@pytest.fixture
+def user(make_user):
+    """A freshly signed up user: its `id` and the `headers` to act as it."""
+    return make_user("tester")
+
+
+@pytest.fixture
+def seed_posts(client):
+    """Insert `count` ready posts of `user_id`, each liked by it and with two comments.
+
+    Returns their ids, newest first.
+    """
+    from datetime import datetime, timedelta, timezone
+
+    from sqlalchemy import insert
+
+    from db import SessionLocal
+    from models.comment_model import CommentModel
+    from models.liked_model import LikedModel
+    from models.post_model import Post
+    from services.ids import new_id
+
+    def seed(user_id, count):
+        now = datetime.now(timezone.utc)
+        posts = [{"id": new_id(), "user_id": user_id, "image_url": f"/media/{i}.jpg", "caption": f"post {i}",
+                  "status": "ready", "likes_count": 1, "comments_count": 2,
+                  "created_at": now - timedelta(minutes=i)} for i in range(count)]
+
+        async def insert_rows():
+            async with SessionLocal() as db:
+                await db.execute(insert(Post), posts)
+                await db.execute(insert(LikedModel), [{"id": new_id(), "user_id": user_id, "post_id": post["id"]}
+                                                      for post in posts])
+                await db.execute(insert(CommentModel), [{"id": new_id(), "user_id": user_id,
+                                                         "post_id": post["id"], "content": f"comment {n}"}
+                                                        for post in posts for n in range(2)])
+                await db.commit()
+
+        client.portal.call(insert_rows)
+        return [post["id"] for post in posts]
+
+    return seed
+
+
+@pytest.fixture
+def query_budget(monkeypatch):
+    """Assert the SQL cost of an endpoint from the profiler's report.
+
+    Profiling is switched on for the test, so every response carries an
+    X-SQL-Profile header:
+
+        response = client.get("/post/list", headers=user["headers"])
+        query_budget(response, statements=5)
+
+    Fails when the response issued more than `statements` statements, more
+    than `repeated` N+1 shapes or more than `slow` slow statements, and
+    shows the offending shapes. Returns the full report.
+    """
+    monkeypatch.setattr(profiler, "SQL_PROFILE", True)
+
+    def check(response, statements=None, repeated=0, slow=None):
+        summary = profiler.parse_summary(response.headers["x-sql-profile"])
+        report = profiler.reports.get(summary["id"])
+
+        problems = []
+        if statements is not None and summary["statements"] > statements:
+            problems.append(f"{summary['statements']} statements, budget {statements}")
+        if repeated is not None and summary["repeated"] > repeated:
+            problems.append(f"{summary['repeated']} repeated shapes, budget {repeated}")
+        if slow is not None and summary["slow"] > slow:
+            problems.append(f"{summary['slow']} slow statements, budget {slow}")
+
+        if problems:
+            details = [f"  {item['count']}x {item['shape']}" for item in report["repeated"]] if report else []
+            raise AssertionError(f"{report['method'] if report else ''} {report['path'] if report else ''}: "
+                                 + "; ".join(problems) + ("\n" + "\n".join(details) if details else ""))
+        return report
+
+    return check
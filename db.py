@@ -1,16 +1,122 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager
+from typing import Optional
 
-if "BASE_URL" not in os.environ:
-    raise ValueError("The BASE_URL environment variable is not set.")
+from fastapi import Header
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-engine = create_engine(os.getenv("BASE_URL"))
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from services.metrics import instrument_engine
+from services.pool_stats import InstrumentedQueuePool, instrument_pool
+from services.profiler import profile_engine
+from services.replicas import replicas
 
-def get_db():
-    db = SessionLocal()
-    try:
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_url(url):
+    # BASE_URL is usually written for a sync driver; swap in its async counterpart
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+def pool_options(url):
+    # In-memory SQLite lives on a single StaticPool connection; nothing to size
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+# Number of connections opened at startup, capped by DB_POOL_SIZE
+POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "0"))
+
+_engine = None
+_replica_engines = None
+_session_factories = {}
+
+def build_engine(url, replica=False):
+    url = async_url(url)
+    options = pool_options(url)
+    # /internal/pool reports on the primary pool only
+    if replica and options:
+        options["poolclass"] = AsyncAdaptedQueuePool
+    engine = create_async_engine(url, **options)
+    if not replica:
+        instrument_pool(engine.sync_engine.pool)
+    instrument_engine(engine.sync_engine)
+    profile_engine(engine.sync_engine)
+    return engine
+
+def get_engine():
+    # The engine is only built on first use, so importing the app touches nothing
+    global _engine
+    if _engine is None:
+        if "BASE_URL" not in os.environ:
+            raise ValueError("The BASE_URL environment variable is not set.")
+        _engine = build_engine(os.getenv("BASE_URL"))
+    return _engine
+
+def get_replica_engines():
+    # REPLICA_URLS: comma separated, same form as BASE_URL; empty means no replicas
+    global _replica_engines
+    if _replica_engines is None:
+        urls = [url.strip() for url in os.getenv("REPLICA_URLS", "").split(",") if url.strip()]
+        _replica_engines = [build_engine(url, replica=True) for url in urls]
+    return _replica_engines
+
+def get_sessionmaker(engine=None):
+    engine = engine or get_engine()
+    if engine not in _session_factories:
+        _session_factories[engine] = async_sessionmaker(bind=engine, class_=AsyncSession,
+                                                        autoflush=False, expire_on_commit=False)
+    return _session_factories[engine]
+
+def SessionLocal():
+    # Same call style as the sessionmaker it used to be: `async with SessionLocal() as db`
+    return get_sessionmaker()()
+
+async def dispose_engine():
+    global _engine, _replica_engines
+    for engine in [_engine, *(_replica_engines or [])]:
+        if engine is not None:
+            await engine.dispose()
+    _engine = None
+    _replica_engines = None
+    _session_factories.clear()
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+async def get_read_db(x_auth_token: Optional[str] = Header(None)):
+    """Session for read-only endpoints: a healthy replica, or the primary.
+
+    Sessions that wrote within READ_YOUR_WRITES_WINDOW stay on the primary, as
+    does everything when no replica is configured or healthy.
+    """
+    engine = await replicas.pick(x_auth_token)
+    async with get_sessionmaker(engine)() as db:
+        db.info["replica"] = engine is not None
+        yield db
+
+@asynccontextmanager
+async def primary_session(db):
+    """`db` itself, or a primary session in its place when `db` reads from a replica.
+
+    For reads whose result goes into the shared feed cache: a lagging replica
+    would store rows older than the version the cache entry is valid for.
+    """
+    if not db.info.get("replica"):
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+        return
+    async with SessionLocal() as primary:
+        yield primary
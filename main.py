@@ -1,13 +1,95 @@
+import time
+
+# Measured from the very first import, so the report covers module loading too
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+# Once, before any module reads its settings from the environment
+load_dotenv()
+
 from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+from routes import auth, internal, metrics, post, user
+from db import POOL_PREWARM, SessionLocal, dispose_engine, get_engine, get_replica_engines
+from services.fanout import fanout_worker
+from services.like_buffer import like_buffer
+from services.metrics import MetricsMiddleware
+from services.profiler import ProfilerMiddleware
+from services.replicas import ReadYourWritesMiddleware, replicas
+from services.passwords import shutdown_executor
+from services.pool_stats import prewarm
+from services.revocation import revocations
+from services.schema import AUTO_CREATE_SCHEMA, check_schema, create_schema
+from services.storage import get_storage
+from services.upload_worker import upload_worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    engine = get_engine()
+    if AUTO_CREATE_SCHEMA:
+        await create_schema(engine)
+    else:
+        await check_schema(engine)
+    await prewarm(engine, POOL_PREWARM)
+    await replicas.start(get_replica_engines())
+    await revocations.rebuild(SessionLocal)
+    refresher = asyncio.create_task(revocations.run(SessionLocal))
+    await fanout_worker.start(SessionLocal)
+    await upload_worker.start(SessionLocal)
+    await like_buffer.start(SessionLocal)
+    if os.getenv("STORAGE_BACKEND") == "local":
+        os.makedirs(get_storage().root, exist_ok=True)
+
+    ready = time.perf_counter()
+    app.state.startup = {
+        "import_ms": round((started - IMPORT_STARTED) * 1000, 1),
+        "lifespan_ms": round((ready - started) * 1000, 1),
+        "total_ms": round((ready - IMPORT_STARTED) * 1000, 1),
+    }
+    logging.info(f"Worker ready: {app.state.startup}")
+    yield
+    await like_buffer.stop()
+    await upload_worker.stop()
+    await fanout_worker.stop()
+    refresher.cancel()
+    await replicas.stop()
+    shutdown_executor()
+    await dispose_engine()
+
+
+def create_app():
+    """Build the app without touching the database or any external service.
+
+    Everything with a cost (engine, schema check, workers, storage and cache
+    clients) happens in the lifespan or on first use. Run with
+    `uvicorn main:create_app --factory`, or `uvicorn main:app`.
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(ProfilerMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
-from models.base_model import Base
-from routes import auth, post
-from db import engine
+    app.include_router(auth.router, prefix="/auth")
+    app.include_router(post.router, prefix="/post")
+    app.include_router(user.router, prefix="/user")
+    app.include_router(internal.router, prefix="/internal", include_in_schema=False)
+    app.include_router(metrics.router, include_in_schema=False)
 
+    # Serve images of the local storage stand-in
+    if os.getenv("STORAGE_BACKEND") == "local":
+        storage = get_storage()
+        app.mount(storage.base_url.rstrip("/"), StaticFiles(directory=storage.root, check_dir=False), name="media")
 
-app = FastAPI()
+    return app
 
-app.include_router(auth.router, prefix="/auth")
-app.include_router(post.router, prefix="/post")
 
-Base.metadata.create_all(engine)
+app = create_app()
@@ -1,28 +1,54 @@
+import hashlib
 import os
-from dotenv import load_dotenv
+import time
 from fastapi import HTTPException, Header
 import jwt
 
-load_dotenv()
+from db import SessionLocal
+from services.lru import TTLCache
+from services.revocation import revocations
 
-def auth_middleware(x_auth_token=Header()):
+# Token yang sudah terverifikasi disimpan sebentar supaya tidak di decode ulang
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+def token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def auth_middleware(x_auth_token=Header()):
     try:
         # Periksa jika token tidak ada
         if not x_auth_token:
             raise HTTPException(status_code=401, detail="Authentication token is required")
-        
-        # Buat variable token yang di verifikasi
-        verified_token = jwt.decode(x_auth_token, os.getenv("PASSWORD_KEY"), ["HS256"])
-        
+
+        # Ambil token yang sudah terverifikasi dari cache, key nya hash dari token
+        key = token_key(x_auth_token)
+        verified_token = token_cache.get(key)
+
+        if verified_token is None:
+            # Buat variable token yang di verifikasi, token wajib punya exp dan iat
+            verified_token = jwt.decode(x_auth_token, os.getenv("PASSWORD_KEY"), ["HS256"],
+                                        options={"require": ["exp", "iat"]})
+
+            # Simpan di cache, tapi tidak lebih lama dari masa berlaku token
+            token_cache.set(key, verified_token, ttl=verified_token["exp"] - time.time())
+
         # Periksa apakah token nya ter verifikasi
         if not verified_token:
             raise HTTPException(status_code=401, detail="Invalid authentication token")
-        
+
+        # Token yang sudah signout ditolak, dicek lewat bloom filter di memory
+        if await revocations.is_revoked(SessionLocal, verified_token.get("jti") or key):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+
         # Buat variable uid untuk menyimpan id yang sudah di samakan dengan token
         uid = verified_token.get("id")
-        
+
         # Kembalikan uid dan token nya
-        return {"uid": uid, "token": x_auth_token}
-    
+        return {"uid": uid, "token": x_auth_token, "jti": verified_token.get("jti") or key,
+                "exp": verified_token["exp"]}
+
     except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
@@ -0,0 +1,15 @@
+import os
+import secrets
+from typing import Optional
+from fastapi import HTTPException, Header
+
+async def internal_middleware(x_internal_token: Optional[str] = Header(None)):
+    # Endpoint internal hanya bisa diakses dengan token INTERNAL_TOKEN
+    expected = os.getenv("INTERNAL_TOKEN")
+
+    # Jika INTERNAL_TOKEN tidak di set, endpoint internal tidak dibuka sama sekali
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid internal token")
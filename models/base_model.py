@@ -1,3 +1,8 @@
+from sqlalchemy import TEXT, Uuid
 from sqlalchemy.ext.declarative import declarative_base
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# Primary and foreign keys: a native 16-byte uuid on Postgres, TEXT on SQLite.
+# Either way the value is the canonical uuid string in Python.
+ID = Uuid(as_uuid=False).with_variant(TEXT(), "sqlite")
@@ -1,16 +1,19 @@
-from sqlalchemy import Column, DateTime, String, ForeignKey, Text
+from sqlalchemy import Column, DateTime, Index, ForeignKey, Text
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
-from models.base_model import Base
+from models.base_model import ID, Base
 
 class CommentModel(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_post_id_created_at", "post_id", "created_at"),
+    )
     
-    id = Column(String, primary_key=True)
-    post_id = Column(String, ForeignKey("posts.id"))
-    user_id = Column(String, ForeignKey("users.id"))
+    id = Column(ID, primary_key=True)
+    post_id = Column(ID, ForeignKey("posts.id", onupdate="CASCADE"))
+    user_id = Column(ID, ForeignKey("users.id"))
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
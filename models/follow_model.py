@@ -0,0 +1,13 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, func
+from models.base_model import ID, Base
+
+class FollowModel(Base):
+    __tablename__ = 'follows'
+    __table_args__ = (
+        # Followers of a user, walked by the timeline fan-out
+        Index("ix_follows_followee_id_follower_id", "followee_id", "follower_id"),
+    )
+
+    follower_id = Column(ID, ForeignKey("users.id"), primary_key=True)
+    followee_id = Column(ID, ForeignKey("users.id"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,13 +1,18 @@
-from sqlalchemy import TEXT, Column, DateTime, ForeignKey, func
-from models.base_model import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Index, func
+from models.base_model import ID, Base
 from sqlalchemy.orm import relationship
 
 class LikedModel(Base):
     __tablename__ = 'liked_posts'
+    __table_args__ = (
+        Index("ux_liked_posts_user_id_post_id", "user_id", "post_id", unique=True),
+        # A user's likes, newest first, and their count
+        Index("ix_liked_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     
-    id = Column(TEXT, primary_key=True)
-    post_id = Column(TEXT, ForeignKey("posts.id"))
-    user_id = Column(TEXT, ForeignKey("users.id"))
+    id = Column(ID, primary_key=True)
+    post_id = Column(ID, ForeignKey("posts.id", onupdate="CASCADE"))
+    user_id = Column(ID, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
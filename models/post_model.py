@@ -1,16 +1,30 @@
-from sqlalchemy import TEXT, VARCHAR, Column, DateTime, ForeignKey, func
+from sqlalchemy import TEXT, VARCHAR, Column, DateTime, ForeignKey, Index, Integer, func
 from sqlalchemy.orm import relationship
-from models.base_model import Base
+from models.base_model import ID, Base
 
 class Post(Base):
     __tablename__ = 'posts'
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        # Posts of one author: profile counts and timeline reads of followed accounts
+        Index("ix_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     
-    id = Column(TEXT, primary_key=True)
+    id = Column(ID, primary_key=True)
     image_url = Column(TEXT)
     caption = Column(VARCHAR(255))
-    user_id = Column(TEXT, ForeignKey("users.id"))
+    user_id = Column(ID, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    saves_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # pending -> ready | failed, driven by the background image upload
+    status = Column(VARCHAR(16), nullable=False, default="ready", server_default="ready")
+    # When an upload worker last took on this pending post; a stale claim is retried
+    claimed_at = Column(DateTime(timezone=True))
+    # The host whose UPLOAD_SPOOL_DIR holds the pending post's image
+    spool_host = Column(VARCHAR(255))
     
     user = relationship("UserModel", back_populates="posts")
     saved_posts = relationship("SavedModel", back_populates="post")
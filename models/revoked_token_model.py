@@ -0,0 +1,12 @@
+from sqlalchemy import TEXT, Column, DateTime, Index, func
+from models.base_model import Base
+
+class RevokedTokenModel(Base):
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        Index("ix_revoked_tokens_created_at", "created_at"),
+    )
+
+    jti = Column(TEXT, primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index
+from models.base_model import ID, Base
+
+class TimelineModel(Base):
+    """Materialized home timeline: one row per (reader, post) written by the fan-out."""
+    __tablename__ = 'timelines'
+    __table_args__ = (
+        # A home timeline page is one range scan over this index
+        Index("ix_timelines_user_id_created_at_post_id", "user_id", "created_at", "post_id"),
+    )
+
+    user_id = Column(ID, ForeignKey("users.id"), primary_key=True)
+    post_id = Column(ID, ForeignKey("posts.id", onupdate="CASCADE"), primary_key=True)
+    author_id = Column(ID, ForeignKey("users.id"), nullable=False)
+    # Copy of posts.created_at so the timeline can be ordered without a join
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,15 +1,20 @@
-from sqlalchemy import TEXT, VARCHAR, Column, LargeBinary
-from models.base_model import Base
+from sqlalchemy import VARCHAR, Column, Index, Integer, LargeBinary
+from models.base_model import ID, Base
 from sqlalchemy.orm import relationship
 
 
 class UserModel(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        Index("ux_users_email", "email", unique=True),
+    )
     
-    id = Column(TEXT, primary_key=True)
+    id = Column(ID, primary_key=True)
     username = Column(VARCHAR(100))
     email = Column(VARCHAR(100))
     password = Column(LargeBinary)
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     posts = relationship("Post", back_populates="user")
     saved_posts = relationship("SavedModel", back_populates="user")
@@ -0,0 +1,35 @@
+import uuid
+
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+
+from services.toggles import BATCH_TOGGLE_LIMIT
+
+
+class ToggleItem(BaseModel):
+    post_id: str
+    action: Literal["add", "remove"]
+
+    @field_validator("post_id")
+    @classmethod
+    def canonical_post_id(cls, value):
+        # Same text form as the stored ids, so uppercase or unhyphenated uuids
+        # find their post; anything else stays as sent and is reported per item
+        try:
+            return str(uuid.UUID(value))
+        except ValueError:
+            return value
+
+
+class BatchToggle(BaseModel):
+    # Checked while the list is parsed, before any item past the limit
+    items: List[ToggleItem] = Field(max_length=BATCH_TOGGLE_LIMIT)
+
+
+class ToggleResult(BaseModel):
+    post_id: str
+    action: str
+    # State after the batch, like `message` of the single toggle endpoints
+    message: Optional[bool]
+    changed: bool
+    error: Optional[str] = None
@@ -1,18 +1,28 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional
 
+from pydantic_schema.ids import Id
+from pydantic_schema.user_response import UserResponse
+
 class CommentBase(BaseModel):
     content: str
 
 class CommentCreate(CommentBase):
-    post_id: str
+    post_id: Id
 
 class CommentResponse(CommentBase):
     id: str
     post_id: str
     user_id: str
-    created_at: Optional[str]
-    updated_at: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
 
     class Config:
         orm_mode = True
+
+class CommentWithUser(CommentBase):
+    id: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    user: UserResponse
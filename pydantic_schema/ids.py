@@ -0,0 +1,13 @@
+import uuid
+from typing import Annotated
+
+from pydantic import AfterValidator
+
+
+def _canonical(value: str) -> str:
+    # Ids are stored as uuids: anything else can never match a row, and on
+    # Postgres would fail inside the query instead of being rejected here
+    return str(uuid.UUID(value))
+
+
+Id = Annotated[str, AfterValidator(_canonical)]
@@ -1,7 +1,9 @@
 from pydantic import BaseModel
 
+from pydantic_schema.ids import Id
+
 class LikedPost(BaseModel):
-    post_id: str
+    post_id: Id
     
     class Config:
         orm_mode = True
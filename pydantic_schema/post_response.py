@@ -0,0 +1,33 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic_schema.comment_post import CommentWithUser
+from pydantic_schema.user_response import UserResponse
+
+
+class PostUploadResponse(BaseModel):
+    id: str
+    image_url: Optional[str]
+    caption: Optional[str]
+    status: str
+    user: UserResponse
+
+
+class PostSummary(BaseModel):
+    id: str
+    image_url: Optional[str]
+    caption: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    liked_by_user: bool
+    saved_by_user: bool
+    user: UserResponse
+
+
+class FeedPost(PostSummary):
+    likes_count: int
+    saves_count: int
+    comments_count: int
+    # Only the latest few; the rest via GET /post/{post_id}/comments
+    comments: List[CommentWithUser]
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic_schema.post_response import PostSummary
+
+
+class PostPage(BaseModel):
+    items: List[PostSummary]
+    # Pass to GET /post/list/liked or /post/list/saved for the rest
+    next_cursor: Optional[str]
+
+
+class ProfileResponse(BaseModel):
+    id: str
+    username: str
+    email: str
+    posts_count: int
+    liked_count: int
+    saved_count: int
+    followers_count: int
+    following_count: int
+    # Only present when asked for with ?include=
+    liked_posts: Optional[PostPage] = None
+    saved_posts: Optional[PostPage] = None
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from pydantic_schema.ids import Id
+
 
 class SavedPost(BaseModel):
-    post_id: str
\ No newline at end of file
+    post_id: Id
\ No newline at end of file
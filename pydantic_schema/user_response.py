@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class UserResponse(BaseModel):
+    id: str
+    username: str
+    email: str
+
+    class Config:
+        orm_mode = True
+
+
+class SigninResponse(BaseModel):
+    token: str
+    user: UserResponse
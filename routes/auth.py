@@ -1,82 +1,137 @@
 import os
+import time
 import uuid
-import bcrypt
-from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 import jwt
-from sqlalchemy.orm import Session, joinedload
-from db import get_db
-from middleware.auth_middleware import auth_middleware
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_db, get_read_db
+from middleware.auth_middleware import auth_middleware, token_cache, token_key
+from models.revoked_token_model import RevokedTokenModel
 from models.user_model import UserModel
 from pydantic_schema.user_create import UserCreate
 from pydantic_schema.user_login import UserLogin
+from pydantic_schema.profile_response import ProfileResponse
+from pydantic_schema.user_response import SigninResponse, UserResponse
+from services.etags import etag_headers, make_etag, not_modified
+from services.feed_cache import feed_cache
+from services.ids import new_id
+from services.pagination import DEFAULT_PAGE_SIZE
+from services.passwords import hash_password, needs_rehash, verify_password
+from services.profile import RELATIONS, load_profile, user_post_page
+from services.revocation import revocations
 
-load_dotenv()
 router = APIRouter()
 
-@router.post("/signup", status_code=201)
-def signup(user: UserCreate, db: Session=Depends(get_db)):
+# Masa berlaku token dalam detik, default 7 hari
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", str(7 * 24 * 3600)))
+
+@router.post("/signup", status_code=201, response_model=UserResponse)
+async def signup(user: UserCreate, db: AsyncSession=Depends(get_db)):
     # membuat variable untuk user dengan email yang sama
-    user_db = db.query(UserModel).filter(UserModel.email == user.email).first()
+    user_db = (await db.execute(select(UserModel).where(UserModel.email == user.email))).scalar_one_or_none()
     
     # Periksa jika user ada dengan email yang sama
     if user_db:
         raise HTTPException(status_code=400, detail="User with the same email already exists!")
     
-    # Hashing password dengan bcrypt
-    hashed_pw = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt(16))
+    # Hashing password dengan bcrypt di process pool, 503 jika antrian penuh
+    hashed_pw = await hash_password(user.password)
     
     # Ubah variable user_db menjadi data yang baru
-    user_db = UserModel(id=str(uuid.uuid4()), username=user.username, email=user.email, password=hashed_pw)
+    user_db = UserModel(id=new_id(), username=user.username, email=user.email, password=hashed_pw)
     
     # add ke database
     db.add(user_db)
-    # commit ke database
-    db.commit()
+    # commit ke database, index unik pada email menolak signup ganda yang balapan
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User with the same email already exists!")
     # refresh data user_db agar dapat di-return
-    db.refresh(user_db)
+    await db.refresh(user_db)
     
     return user_db
 
-@router.post("/signin", status_code=200)
-def signin(user: UserLogin, db: Session=Depends(get_db)):
+@router.post("/signin", status_code=200, response_model=SigninResponse)
+async def signin(user: UserLogin, db: AsyncSession=Depends(get_db)):
     # membuat variable untuk user dengan email yang sama
-    user_db = db.query(UserModel).filter(UserModel.email == user.email).first()
+    user_db = (await db.execute(select(UserModel).where(UserModel.email == user.email))).scalar_one_or_none()
     
     # Kembalikan error jika user dengan email yang di input tidak ada
     if not user_db:
         raise HTTPException(status_code=400, detail="User with this email does not exists!")
     
     # Variable untuk validasi password 
-    is_match = bcrypt.checkpw(user.password.encode(), user_db.password)
+    is_match = await verify_password(user.password, user_db.password)
     
     # Jika password tidak sama, tampilkan error "Password is incorrect!"
     if not is_match:
         raise HTTPException(status_code=400, detail="Password is incorrect!")
     
-    # Buat token jwt untuk autentikasi login
-    token = jwt.encode({"id": user_db.id}, os.getenv("PASSWORD_KEY"))
+    # Hash dengan cost lama di hash ulang memakai BCRYPT_ROUNDS saat ini
+    if needs_rehash(user_db.password):
+        user_db.password = await hash_password(user.password)
+        await db.commit()
+        # Data user berubah, ETag /auth/me yang lama tidak berlaku lagi
+        await feed_cache.bump(f"user:{user_db.id}")
+    
+    # Buat token jwt untuk autentikasi login, dengan iat/exp dan jti untuk revoke
+    now = int(time.time())
+    token = jwt.encode({"id": user_db.id, "iat": now, "exp": now + TOKEN_TTL, "jti": uuid.uuid4().hex},
+                       os.getenv("PASSWORD_KEY"))
     
     # Kembalikan token jwt dan user untuk autentikasi login
     return {"token": token, "user": user_db}
 
-@router.get("/me")
-def current_user(db: Session=Depends(get_db), user_dict=Depends(auth_middleware)):
-    # Cek jika user saat ini ter autentikasi atau tidak
-    user = db.query(UserModel).filter(UserModel.id == user_dict["uid"]).options(
-        joinedload(UserModel.saved_posts),
-        joinedload(UserModel.liked_posts)).first()
+@router.get("/me", response_model=ProfileResponse)
+async def current_user(request: Request, response: Response,
+                       include: Optional[str] = Query(None, description="Comma separated: liked_posts, saved_posts"),
+                       db: AsyncSession=Depends(get_read_db), user_dict=Depends(auth_middleware)):
+    # Relasi hanya dimuat jika diminta lewat include
+    includes = [name.strip() for name in include.split(",") if name.strip()] if include else []
+    unknown = [name for name in includes if name not in RELATIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(unknown)}")
+    
+    # Jika tidak ada perubahan sejak versi milik client, balas 304 tanpa query
+    etag = await make_etag(request, f"user:{user_dict['uid']}")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Profil dan jumlah post, like, save dan follower diambil dalam satu query
+    profile = await load_profile(db, user_dict["uid"])
     
     # jika tidak maka kembalikan "user not found!"
-    if not user:
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found!")
     
-    # Kembalikan user nya
-    return user
+    # Hanya halaman pertama, sisanya lewat /post/list/liked atau /post/list/saved dengan cursor
+    for name in includes:
+        items, next_cursor = await user_post_page(db, RELATIONS[name], user_dict["uid"], None, DEFAULT_PAGE_SIZE)
+        profile[name] = {"items": items, "next_cursor": next_cursor}
+    
+    # Kembalikan profil nya
+    response.headers.update(etag_headers(etag))
+    return profile
 
 @router.post("/signout", status_code=200)
-def signout(user_dict=Depends(auth_middleware)):
+async def signout(db: AsyncSession=Depends(get_db), user_dict=Depends(auth_middleware)):
     if not user_dict:
         raise HTTPException(status_code=401, detail="User not authenticated!")
     
+    # Simpan token ke daftar revoke sampai masa berlakunya habis
+    db.add(RevokedTokenModel(jti=user_dict["jti"],
+                             expires_at=datetime.fromtimestamp(user_dict["exp"], timezone.utc)))
+    await db.commit()
+    
+    # Worker ini langsung menolak token nya, worker lain lewat refresh berkala
+    revocations.add(user_dict["jti"])
+    token_cache.delete(token_key(user_dict["token"]))
+    
     return {"message": "Successfully signed out"}
\ No newline at end of file
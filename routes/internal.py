@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from db import get_engine
+from middleware.internal_middleware import internal_middleware
+from services.feed_cache import feed_cache
+from services.like_buffer import like_buffer
+from services.pool_stats import pool_stats
+from services.profiler import reports
+from services.replicas import replicas
+
+router = APIRouter(dependencies=[Depends(internal_middleware)])
+
+@router.get("/pool")
+async def pool_status():
+    # Snapshot of the connection pool, used to size it against max_connections
+    return pool_stats.snapshot(get_engine().sync_engine.pool)
+
+@router.get("/startup")
+async def startup_status(request: Request):
+    # How long this worker took from first import to serving
+    return request.app.state.startup
+
+@router.get("/cache")
+async def cache_status():
+    # Hit/miss counters of the feed cache
+    return feed_cache.snapshot()
+
+@router.get("/likes")
+async def like_buffer_status():
+    # Write-behind like buffer: pending intents and flush counters
+    return like_buffer.snapshot()
+
+@router.get("/replicas")
+async def replica_status():
+    # Health and lag of the read replicas, and sessions pinned to the primary
+    return replicas.snapshot()
+
+@router.get("/sql-profile/{report_id}")
+async def sql_profile(report_id: str):
+    # Full SQL report of a profiled request, linked from its X-SQL-Profile-Report header
+    report = reports.get(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found or expired")
+    return report
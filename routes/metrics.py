@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from middleware.internal_middleware import internal_middleware
+from services.metrics import metrics
+
+router = APIRouter(dependencies=[Depends(internal_middleware)])
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    # Prometheus text exposition format; scrape with the X-Internal-Token header
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,72 +1,100 @@
-import os
-from typing import List
-import uuid
-import cloudinary.uploader
-from dotenv import load_dotenv
-import cloudinary
-from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, Form, Query, Request, UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 
-from db import get_db
+from db import get_db, get_read_db
 from middleware.auth_middleware import auth_middleware
 from models.comment_model import CommentModel
 from models.liked_model import LikedModel
 from models.post_model import Post
 from models.saved_model import SavedModel
 from models.user_model import UserModel
-from pydantic_schema.comment_post import CommentCreate, CommentResponse
+from pydantic_schema.batch_toggle import BatchToggle, ToggleResult
+from pydantic_schema.comment_post import CommentCreate, CommentResponse, CommentWithUser
+from pydantic_schema.ids import Id
+from pydantic_schema.post_response import FeedPost, PostSummary, PostUploadResponse
 from pydantic_schema.saved_post import SavedPost
-
-load_dotenv()
+from services.etags import etag_headers, make_etag, not_modified
+from services.counters import increment
+from services.feed import load_page_ids, render_posts
+from services.feed_cache import feed_cache
+from services.ids import new_id
+from services.like_buffer import like_buffer
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from services.profile import user_post_page
+from services.reads import comment_dict, select_comments
+from services.timeline import home_timeline_ids
+from services.responses import ORJSONResponse
+from services.search import index_comment, search_post_ids, unindex_comment
+from services.toggles import batch_toggle, toggle
+from services.upload_worker import UPLOAD_HOST, UploadQueueFull, upload_worker
 
 router = APIRouter()
 
-cloudinary.config( 
-    cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME"), 
-    api_key = os.getenv("CLOUDINARY_API_KEY"),  
-    api_secret = os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
-
-@router.post("/upload", status_code=201)
-def upload_post(image_url: UploadFile = File(...),
+@router.post("/upload", status_code=201, response_model=PostUploadResponse)
+async def upload_post(image_url: UploadFile = File(...),
                 caption: str = Form(),
-                db: Session = Depends(get_db),
+                db: AsyncSession = Depends(get_db),
                 auth_dict = Depends(auth_middleware)):
     try:
         logging.info("Start upload_post function")
 
-        # Generate uuid for post
-        post_id = str(uuid.uuid4())
+        # Time-ordered id for the post
+        post_id = new_id()
         logging.info(f"Generated post_id: {post_id}")
         
-        # Upload image to cloudinary and store in image_res
-        logging.info("Uploading image to Cloudinary")
-        image_res = cloudinary.uploader.upload(image_url.file, resource_type="image", folder=f"posts/{post_id}")
-        logging.info(f"Image uploaded to Cloudinary: {image_res['url']}")
+        # Refuse early instead of spooling a file nobody will upload
+        if upload_worker.full():
+            raise HTTPException(status_code=503, detail="Upload queue is full, please try again",
+                                headers={"Retry-After": "5"})
+        
+        # Spool the image to local disk; the storage upload happens in the background
+        logging.info("Spooling image")
+        await run_in_threadpool(upload_worker.spool, image_url.file, post_id)
         
-        # Create a new post
+        # Create a new post, pending until the upload worker finishes, which this process claims
         new_post = Post(
             id=post_id,
-            image_url=image_res["url"],
             caption=caption,
-            user_id=auth_dict["uid"]
+            user_id=auth_dict["uid"],
+            status="pending",
+            claimed_at=datetime.now(timezone.utc),
+            spool_host=UPLOAD_HOST
         )
         
-        db.add(new_post)
-        db.commit()
-        db.refresh(new_post)
+        try:
+            db.add(new_post)
+            await db.commit()
+            await db.refresh(new_post)
+        except BaseException:
+            # No post refers to the spooled file
+            await run_in_threadpool(upload_worker.discard, post_id)
+            raise
         logging.info("New post committed to database")
         
-        user = db.query(UserModel).filter(UserModel.id == auth_dict["uid"]).first()
+        try:
+            upload_worker.submit(post_id)
+        except UploadQueueFull:
+            new_post.status = "failed"
+            await db.commit()
+            await run_in_threadpool(upload_worker.discard, post_id)
+            raise HTTPException(status_code=503, detail="Upload queue is full, please try again",
+                                headers={"Retry-After": "5"})
+        logging.info("Image queued for upload")
+        
+        user = await db.get(UserModel, auth_dict["uid"])
         logging.info(f"User fetched from database: {user.id}")
         
         response = {
             "id": new_post.id,
             "image_url": new_post.image_url,
             "caption": new_post.caption,
+            "status": new_post.status,
             "user": {
                 "id": user.id,
                 "username": user.username,
@@ -76,193 +104,226 @@ def upload_post(image_url: UploadFile = File(...),
         
         logging.info("Returning response")
         return response
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         logging.error("Database error occurred", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         logging.error("An error occurred", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/list")
-def list_post(db: Session = Depends(get_db),
+@router.get("/list", response_model=List[FeedPost])
+async def list_post(request: Request,
+              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              cursor: Optional[str] = None,
+              db: AsyncSession = Depends(get_read_db),
               auth_details = Depends(auth_middleware)):
     try:
         user_id = auth_details["uid"]
         
-        # Query posts with related data
-        posts = db.query(Post).options(
-            joinedload(Post.user),
-            joinedload(Post.liked_posts).joinedload(LikedModel.user),
-            joinedload(Post.saved_posts).joinedload(SavedModel.user),
-            joinedload(Post.comments).joinedload(CommentModel.user)
-        ).all()
+        # The page's post ids, usually straight from the feed cache
+        post_ids, next_cursor = await load_page_ids(db, cursor, limit)
         
-        response = []
-        for post in posts:
-            liked_by_user = any(liked.user_id == user_id for liked in post.liked_posts)
-            saved_by_user = any(saved.user_id == user_id for saved in post.saved_posts)
-            
-            comments = []
-            for comment in post.comments:
-                comments.append({
-                    "id": comment.id,
-                    "content": comment.content,
-                    "created_at": comment.created_at,
-                    "updated_at": comment.updated_at,
-                    "user": {
-                        "id": comment.user.id,
-                        "username": comment.user.username,
-                        "email": comment.user.email
-                    }
-                })
-                
-            response.append({
-                "id": post.id,
-                "image_url": post.image_url,
-                "caption": post.caption,
-                "created_at": post.created_at,
-                "updated_at": post.updated_at,
-                "liked_by_user": liked_by_user,
-                "saved_by_user": saved_by_user,
-                "likes_count": len(post.liked_posts),
-                "saves_count": len(post.saved_posts),
-                "comments": comments,
-                "user": {
-                    "id": post.user.id,
-                    "username": post.user.username,
-                    "email": post.user.email
-                }
-            })
+        # Nothing changed on this page since the client's copy: skip the posts and the body.
+        # Likes or comments elsewhere in the feed leave its ETag alone
+        etag = await make_etag(request, "feed", f"user:{user_id}", *(f"post:{post_id}" for post_id in post_ids))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
         
-        return response
+        # Shared post fragments come from the feed cache, viewer flags are merged in
+        result = await render_posts(db, user_id, post_ids)
+        
+        # The body stays a plain list; the next page is advertised in a header
+        headers = etag_headers(etag)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return ORJSONResponse(result, headers=headers)
     except SQLAlchemyError as e:
         logging.error("Database error occurred", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.get("/timeline", response_model=List[FeedPost])
+async def home_timeline(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        cursor: Optional[str] = None,
+                        db: AsyncSession = Depends(get_read_db),
+                        auth_details = Depends(auth_middleware)):
+    user_id = auth_details["uid"]
+    
+    # Posts of followed accounts (and the user's own), newest first
+    post_ids, next_cursor = await home_timeline_ids(db, user_id, cursor, limit)
+    result = await render_posts(db, user_id, post_ids)
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(result, headers=headers)
+    
+@router.get("/search", response_model=List[FeedPost])
+async def search_posts(q: str = Query(..., min_length=1, max_length=200),
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       cursor: Optional[str] = None,
+                       db: AsyncSession = Depends(get_read_db),
+                       auth_details = Depends(auth_middleware)):
+    user_id = auth_details["uid"]
+    
+    # Captions and comments through the text index, best matches first
+    post_ids, next_cursor = await search_post_ids(db, q, cursor, limit)
+    result = await render_posts(db, user_id, post_ids)
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(result, headers=headers)
+    
 @router.post("/liked")
-def liked_post(post: SavedPost,
-               db: Session=Depends(get_db),
+async def liked_post(post: SavedPost,
+               db: AsyncSession=Depends(get_db),
                auth_details=Depends(auth_middleware)):
     user_id = auth_details["uid"]
     
-    liked_post = db.query(LikedModel).filter(LikedModel.post_id == post.post_id, LikedModel.user_id == user_id).first()
+    # Write-behind mode: the like reaches the database with the next bulk flush
+    if like_buffer.enabled:
+        return {"message": await like_buffer.toggle(db, user_id, post.post_id)}
+    
+    liked = await toggle(db, LikedModel, Post.likes_count, post.post_id, user_id)
+    await feed_cache.invalidate_post(post.post_id)
+    await feed_cache.bump(f"user:{user_id}")
+    return {"message": liked}
     
-    if liked_post:
-        db.delete(liked_post)
-        db.commit()
-        return {"message": False}
-    else:
-        new_liked_post = LikedModel(id=str(uuid.uuid4()), post_id=post.post_id, user_id=user_id)
-        db.add(new_liked_post)
-        db.commit()
-        return {"message": True}
+@router.post("/liked/batch", response_model=List[ToggleResult])
+async def liked_post_batch(batch: BatchToggle,
+                           db: AsyncSession = Depends(get_db),
+                           auth_details = Depends(auth_middleware)):
+    # Buffered likes go first so they cannot overwrite the batch later
+    if like_buffer.enabled:
+        await like_buffer.flush()
+    return await apply_batch(batch, db, auth_details["uid"], LikedModel, Post.likes_count)
     
-@router.get("/list/liked")
-def list_liked_post(db: Session = Depends(get_db),
+@router.get("/list/liked", response_model=List[PostSummary])
+async def list_liked_post(request: Request,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    cursor: Optional[str] = None,
+                    db: AsyncSession = Depends(get_read_db),
                     auth_details = Depends(auth_middleware)):
     user_id = auth_details["uid"]
     
-    liked_posts = db.query(LikedModel).filter(LikedModel.user_id == user_id).options(
-        joinedload(LikedModel.post).joinedload(Post.user),
-    ).all()
+    # Only the user's own likes and saves change this list
+    etag = await make_etag(request, f"user:{user_id}")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    response = []
-    for liked_post in liked_posts:
-        post = liked_post.post
-        response.append({
-            "id": post.id,
-            "image_url": post.image_url,
-            "caption": post.caption,
-            "created_at": post.created_at,
-            "updated_at": post.updated_at,
-            "user": {
-                "id": post.user.id,
-                "username": post.user.username,
-                "email": post.user.email
-            }
-        })
+    # Most recently liked first, one page at a time
+    response, next_cursor = await user_post_page(db, LikedModel, user_id, cursor, limit)
     
-    return response
+    headers = etag_headers(etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return ORJSONResponse(response, headers=headers)
 
 @router.post("/saved")
-def saved_post(post: SavedPost,
-               db: Session=Depends(get_db),
+async def saved_post(post: SavedPost,
+               db: AsyncSession=Depends(get_db),
                auth_details=Depends(auth_middleware)):
     
     user_id =  auth_details["uid"]
     
-    saved_post = db.query(SavedModel).filter(SavedModel.post_id == post.post_id, SavedModel.user_id == user_id).first()
+    saved = await toggle(db, SavedModel, Post.saves_count, post.post_id, user_id)
+    await feed_cache.invalidate_post(post.post_id)
+    await feed_cache.bump(f"user:{user_id}")
+    return {"message": saved}
+    
+@router.post("/saved/batch", response_model=List[ToggleResult])
+async def saved_post_batch(batch: BatchToggle,
+                           db: AsyncSession = Depends(get_db),
+                           auth_details = Depends(auth_middleware)):
+    return await apply_batch(batch, db, auth_details["uid"], SavedModel, Post.saves_count)
     
-    if saved_post:
-        db.delete(saved_post)
-        db.commit()
-        return {"message": False}
-    else:
-        new_saved_post = SavedModel(id=str(uuid.uuid4()), post_id=post.post_id, user_id=user_id)
-        db.add(new_saved_post)
-        db.commit()
-        return {"message": True}
+async def apply_batch(batch, db, user_id, model, counter):
+    # Offline sync: every queued action in one transaction, one result per item;
+    # BatchToggle already refused more than BATCH_TOGGLE_LIMIT items
+    results, changed = await batch_toggle(db, model, counter, user_id,
+                                          [(item.post_id, item.action) for item in batch.items])
+    await feed_cache.invalidate_posts(changed)
+    if changed:
+        await feed_cache.bump(f"user:{user_id}")
+    return results
     
-@router.get("/list/saved")
-def list_saved_post(db: Session = Depends(get_db),
+@router.get("/list/saved", response_model=List[PostSummary])
+async def list_saved_post(request: Request,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    cursor: Optional[str] = None,
+                    db: AsyncSession = Depends(get_read_db),
                     auth_details = Depends(auth_middleware)):
     user_id = auth_details["uid"]
     
-    saved_posts = db.query(SavedModel).filter(SavedModel.user_id == user_id).options(
-        joinedload(SavedModel.post).joinedload(Post.user),
-    ).all()
+    # Only the user's own likes and saves change this list
+    etag = await make_etag(request, f"user:{user_id}")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    # Logging for debugging
-    for saved_post in saved_posts:
-        logging.info(f"Saved post: {saved_post.post}")
+    # Most recently saved first, one page at a time
+    response, next_cursor = await user_post_page(db, SavedModel, user_id, cursor, limit)
     
-    response = []
-    for saved_post in saved_posts:
-        post = saved_post.post
-        response.append({
-            "id": post.id,
-            "image_url": post.image_url,
-            "caption": post.caption,
-            "created_at": post.created_at,
-                "updated_at": post.updated_at,
-            "user": {
-                "id": post.user.id,
-                "username": post.user.username,
-                "email": post.user.email
-            }
-        })
-    
-    return response
+    headers = etag_headers(etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return ORJSONResponse(response, headers=headers)
 
-@router.post("/comments")
-def create_comment(comment: CommentCreate,
-                   db: Session = Depends(get_db),
+@router.post("/comments", response_model=CommentResponse)
+async def create_comment(comment: CommentCreate,
+                   db: AsyncSession = Depends(get_db),
                    auth_details = Depends(auth_middleware)):
     user_id = auth_details["uid"]
     
+    # A comment on an unknown post would dangle and count nowhere
+    if (await db.execute(select(Post.id).where(Post.id == comment.post_id))).first() is None:
+        raise HTTPException(status_code=404, detail="Post not found!")
+    
     new_comment = CommentModel(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         post_id=comment.post_id,
         user_id=user_id,
         content=comment.content
     )
     
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await increment(db, comment.post_id, Post.comments_count)
+    await index_comment(db, new_comment)
+    await db.commit()
+    await db.refresh(new_comment)
+    await feed_cache.invalidate_post(comment.post_id)
     
     return new_comment
 
+@router.get("/{post_id}/comments", response_model=List[CommentWithUser])
+async def list_comments(post_id: Id,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        cursor: Optional[str] = None,
+                        db: AsyncSession = Depends(get_read_db),
+                        auth_details = Depends(auth_middleware)):
+    # Comments of one post, newest first, paginated on (created_at, id)
+    query = select_comments().where(CommentModel.post_id == post_id)
+    rows, next_cursor = await keyset_page(db, query, CommentModel.created_at, CommentModel.id, cursor, limit,
+                                          key=lambda row: (row.created_at, row.id))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse([comment_dict(row) for row in rows], headers=headers)
+
 @router.delete("/comments/{comment_id}")
-def delete_comment(comment_id: str, db: Session = Depends(get_db), auth_details = Depends(auth_middleware)):
+async def delete_comment(comment_id: Id, db: AsyncSession = Depends(get_db), auth_details = Depends(auth_middleware)):
     user_id = auth_details["uid"]
-    comment = db.query(CommentModel).filter(CommentModel.id == comment_id, CommentModel.user_id == user_id).first()
+    comment = (await db.execute(
+        select(CommentModel).where(CommentModel.id == comment_id, CommentModel.user_id == user_id)
+    )).scalar_one_or_none()
     
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found or not authorized")
     
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await increment(db, comment.post_id, Post.comments_count, -1)
+    await unindex_comment(db, comment.id)
+    await db.commit()
+    await feed_cache.invalidate_post(comment.post_id)
     
     return {"message": "Comment deleted successfully"}
\ No newline at end of file
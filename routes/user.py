@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_db
+from middleware.auth_middleware import auth_middleware
+from models.user_model import UserModel
+from pydantic_schema.ids import Id
+from services.feed_cache import feed_cache
+from services.timeline import toggle_follow
+
+router = APIRouter()
+
+@router.post("/{user_id}/follow")
+async def follow_user(user_id: Id,
+                      db: AsyncSession = Depends(get_db),
+                      auth_details = Depends(auth_middleware)):
+    follower_id = auth_details["uid"]
+    
+    if user_id == follower_id:
+        raise HTTPException(status_code=400, detail="You cannot follow yourself")
+    
+    if not await db.get(UserModel, user_id):
+        raise HTTPException(status_code=404, detail="User not found!")
+    
+    # Toggles like /post/liked: True when now following
+    following = await toggle_follow(db, follower_id, user_id)
+    await feed_cache.bump(f"user:{follower_id}", f"user:{user_id}")
+    return {"message": following}
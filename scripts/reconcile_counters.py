@@ -0,0 +1,27 @@
+"""Fix drift in the denormalized post counters.
+
+Usage (from the repository root):
+
+    python -m scripts.reconcile_counters [post_id ...]
+
+Without arguments every post is checked.
+"""
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from db import SessionLocal
+from services.counters import reconcile_counters
+
+
+async def main(argv):
+    async with SessionLocal() as db:
+        fixed = await reconcile_counters(db, post_ids=argv or None)
+    print(f"Reconciled counters of {fixed} posts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""Give rows created before UUIDv7 ids a time-ordered id, in small batches.
+
+Usage (from the repository root, after `alembic upgrade head`):
+
+    python -m scripts.rekey_ids [--batch 500] [--tables posts,comments]
+
+Each row whose id is not a UUIDv7 yet gets the UUIDv7 of its created_at, so
+ordering by id matches ordering by time. Every batch is its own short
+transaction, so the app keeps serving while this runs, and the script can be
+stopped and started again at any point. On Postgres references to posts.id
+follow through ON UPDATE CASCADE; on SQLite they are updated here.
+
+User ids are left alone: they are inside every issued token and never used
+as a sort key. Post and comment ids change, so links and cursors holding
+an old id stop working. Once every table is done, set ID_ORDERED_FEED=true.
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import String, bindparam, cast, func, select, text, update
+
+from db import dispose_engine, get_engine
+from models.base_model import ID
+from models.comment_model import CommentModel
+from models.liked_model import LikedModel
+from models.post_model import Post
+from models.saved_model import SavedModel
+from models.timeline_model import TimelineModel
+from services.feed_cache import feed_cache
+from services.ids import id_at
+
+TABLES = {
+    "posts": Post.__table__,
+    "comments": CommentModel.__table__,
+    "liked_posts": LikedModel.__table__,
+    "saved_posts": SavedModel.__table__,
+}
+
+# Columns holding a copy of a rekeyed id, which SQLite does not cascade to
+SQLITE_REFERENCES = {
+    "posts": [
+        CommentModel.__table__.c.post_id,
+        LikedModel.__table__.c.post_id,
+        SavedModel.__table__.c.post_id,
+        TimelineModel.__table__.c.post_id,
+    ],
+}
+SQLITE_SEARCH_INDEX = {
+    "posts": "UPDATE search_index SET post_id = :new WHERE post_id = :old",
+    "comments": "UPDATE search_index SET comment_id = :new WHERE comment_id = :old",
+}
+
+
+async def rekey_table(engine, name, batch):
+    table = TABLES[name]
+    # The version digit of the canonical text form
+    not_v7 = func.substr(cast(table.c.id, String), 15, 1) != "7"
+    # A new key is not an edit: updated_at is kept, not bumped by its onupdate
+    rekey = update(table).where(table.c.id == bindparam("old", type_=ID)).values(
+        id=bindparam("new", type_=ID), updated_at=table.c.updated_at,
+    )
+
+    last, total = None, 0
+    while True:
+        async with engine.begin() as conn:
+            query = select(table.c.id, table.c.created_at).where(not_v7).order_by(table.c.id).limit(batch)
+            if last is not None:
+                query = query.where(table.c.id > bindparam("last", last, type_=ID))
+            rows = (await conn.execute(query)).all()
+            if not rows:
+                return total
+
+            # The old id supplies the random bits, so a rerun computes the same new id
+            changes = [{
+                "old": id,
+                "new": id_at(created_at or datetime.now(timezone.utc), uuid.UUID(id).int),
+            } for id, created_at in rows]
+            await conn.execute(rekey, changes)
+
+            if conn.dialect.name == "sqlite":
+                for column in SQLITE_REFERENCES.get(name, []):
+                    values = {column.name: bindparam("new")}
+                    if "updated_at" in column.table.c:
+                        values["updated_at"] = column.table.c.updated_at
+                    await conn.execute(
+                        update(column.table).where(column == bindparam("old")).values(values),
+                        changes,
+                    )
+                if name in SQLITE_SEARCH_INDEX and (await conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+                )).first():
+                    await conn.execute(text(SQLITE_SEARCH_INDEX[name]), changes)
+
+        last = rows[-1].id
+        total += len(rows)
+        print(f"{name}: {total} rows rekeyed")
+
+
+async def main(args):
+    engine = get_engine()
+    names = args.tables.split(",") if args.tables else list(TABLES)
+    for name in names:
+        if name not in TABLES:
+            raise SystemExit(f"Unknown table {name}; choose from {', '.join(TABLES)}")
+        await rekey_table(engine, name, args.batch)
+
+    # Cached feed pages still list the old post ids
+    await feed_cache.invalidate_pages()
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--tables", help=f"comma separated, default all of: {', '.join(TABLES)}")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,46 @@
+"""Stand-in replication for trying read replicas locally with SQLite.
+
+Usage (from the repository root):
+
+    python -m scripts.sqlite_replica app.db replica.db [--interval 2]
+
+Copies the primary file into the replica file every --interval seconds
+with SQLite's online backup API, so the replica trails the primary like a
+lagging streaming replica would. Then run the app with
+
+    BASE_URL=sqlite:///app.db REPLICA_URLS=sqlite:///replica.db
+"""
+import argparse
+import sqlite3
+import time
+
+
+def copy(primary, replica):
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(replica)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("primary")
+    parser.add_argument("replica")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between copies, i.e. the lag")
+    parser.add_argument("--once", action="store_true", help="copy once and exit")
+    args = parser.parse_args()
+
+    while True:
+        started = time.perf_counter()
+        copy(args.primary, args.replica)
+        print(f"Replicated in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
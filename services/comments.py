@@ -0,0 +1,45 @@
+import os
+
+from sqlalchemy import func, select
+
+from models.comment_model import CommentModel
+from models.user_model import UserModel
+from services.reads import AUTHOR_COLUMNS, comment_dict
+
+# Number of latest comments embedded in each feed entry
+COMMENT_PREVIEW_SIZE = int(os.getenv("COMMENT_PREVIEW_SIZE", "3"))
+
+
+async def latest_comments(db, post_ids, per_post=COMMENT_PREVIEW_SIZE):
+    """The newest `per_post` comments of every post in `post_ids`.
+
+    One query for the whole page: `ROW_NUMBER() OVER (PARTITION BY post_id
+    ORDER BY created_at DESC, id DESC)` ranks the comments of each post and
+    only the top `per_post` ranks are joined with their authors. Returns a
+    dict of post id to comment dicts, newest first.
+    """
+    previews = {post_id: [] for post_id in post_ids}
+    if not post_ids or per_post <= 0:
+        return previews
+
+    rank = func.row_number().over(
+        partition_by=CommentModel.post_id,
+        order_by=(CommentModel.created_at.desc(), CommentModel.id.desc()),
+    ).label("rank")
+    ranked = (
+        select(CommentModel.id, CommentModel.post_id, CommentModel.user_id, CommentModel.content,
+               CommentModel.created_at, CommentModel.updated_at, rank)
+        .where(CommentModel.post_id.in_(list(post_ids)))
+        .subquery()
+    )
+    query = (
+        select(ranked, *AUTHOR_COLUMNS)
+        .join(UserModel, UserModel.id == ranked.c.user_id)
+        .where(ranked.c.rank <= per_post)
+        .order_by(ranked.c.post_id, ranked.c.rank)
+    )
+
+    for row in await db.execute(query):
+        previews[row.post_id].append(comment_dict(row))
+
+    return previews
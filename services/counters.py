@@ -0,0 +1,75 @@
+from sqlalchemy import case, func, or_, select, update
+
+from models.comment_model import CommentModel
+from models.liked_model import LikedModel
+from models.post_model import Post
+from models.saved_model import SavedModel
+
+
+async def increment(db, post_id, column, delta=1):
+    """Atomically add `delta` to one of the counter columns of a post.
+
+    The change is issued as `UPDATE posts SET n = n + delta` inside the caller's
+    transaction, so it commits (or rolls back) together with the row that
+    caused it. `updated_at` is left alone: a like is not an edit of the post.
+    """
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values({column: column + delta, Post.updated_at: Post.updated_at})
+    )
+
+
+async def increment_many(db, column, deltas):
+    """Apply a `{post_id: delta}` mapping to one counter column in a single UPDATE.
+
+    The per-post deltas are folded into a `CASE posts.id WHEN ... THEN ...`
+    expression, so a batch of toggles costs one statement however many posts
+    it touches. Zero deltas are skipped.
+    """
+    deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    await db.execute(
+        update(Post)
+        .where(Post.id.in_(list(deltas)))
+        .values({column: column + case(deltas, value=Post.id, else_=0), Post.updated_at: Post.updated_at})
+    )
+
+
+def _counted(model):
+    return (
+        select(func.count(model.id))
+        .where(model.post_id == Post.id)
+        .correlate(Post)
+        .scalar_subquery()
+    )
+
+
+async def reconcile_counters(db, post_ids=None):
+    """Recompute the counters from the source tables and fix any drift.
+
+    Runs as a single bulk UPDATE that only touches rows whose stored counts
+    differ from the real ones. Returns the number of posts that were fixed.
+    """
+    likes = _counted(LikedModel)
+    saves = _counted(SavedModel)
+    comments = _counted(CommentModel)
+
+    stmt = update(Post).where(or_(
+        Post.likes_count != likes,
+        Post.saves_count != saves,
+        Post.comments_count != comments,
+    ))
+    if post_ids is not None:
+        stmt = stmt.where(Post.id.in_(post_ids))
+
+    result = await db.execute(stmt.values({
+        Post.likes_count: likes,
+        Post.saves_count: saves,
+        Post.comments_count: comments,
+        Post.updated_at: Post.updated_at,
+    }))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,52 @@
+import hashlib
+import time
+import uuid
+
+from fastapi import Response
+
+from services.feed_cache import FEED_CACHE_TTL, MemoryBackend, NullBackend, feed_cache
+
+# Memory backend versions are per process and start from zero in each one
+ETAG_INSTANCE = uuid.uuid4().hex
+
+
+async def make_etag(request, *scopes):
+    """Strong ETag for a response that only changes when `scopes` are bumped.
+
+    The tag hashes the request path and query with the current versions of
+    the scopes, read from the feed cache backend, so computing it costs one
+    counter lookup and no SQL. With the per-process memory backend a write
+    on another worker is not seen here; the tag then also rolls over every
+    FEED_CACHE_TTL seconds, the same staleness bound as the feed cache.
+    Returns None when versions are not tracked (FEED_CACHE_BACKEND=none).
+    """
+    backend = feed_cache.backend
+    if isinstance(backend, NullBackend):
+        return None
+
+    versions = await feed_cache.versions(*scopes)
+    parts = [request.url.path, request.url.query, *scopes, *map(str, versions)]
+    if isinstance(backend, MemoryBackend):
+        parts += [ETAG_INSTANCE, str(int(time.time() // FEED_CACHE_TTL))]
+    return '"' + hashlib.sha256("\0".join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def etag_headers(etag):
+    if etag is None:
+        return {}
+    # Clients may keep the body but must revalidate before reusing it
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(request, etag):
+    """A 304 response when `If-None-Match` carries `etag`, else None."""
+    if etag is None:
+        return None
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, exists, select
+
+from models.follow_model import FollowModel
+from models.post_model import Post
+from models.timeline_model import TimelineModel
+from models.user_model import UserModel
+from services.toggles import upsert_insert
+
+# Authors with more followers than this are not fanned out on write; their
+# posts are merged into followers' timelines at read time instead
+FANOUT_MAX_FOLLOWERS = int(os.getenv("FANOUT_MAX_FOLLOWERS", "10000"))
+FANOUT_BATCH_SIZE = int(os.getenv("FANOUT_BATCH_SIZE", "1000"))
+FANOUT_QUEUE_SIZE = int(os.getenv("FANOUT_QUEUE_SIZE", "1000"))
+# At startup, ready posts this recent whose fan-out never finished are fanned out again
+FANOUT_RECOVERY_SECONDS = float(os.getenv("FANOUT_RECOVERY_SECONDS", "86400"))
+
+
+def is_celebrity(followers_count):
+    return followers_count > FANOUT_MAX_FOLLOWERS
+
+
+async def insert_timeline_rows(db, rows):
+    if rows:
+        await db.execute(
+            upsert_insert(db, TimelineModel)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+        )
+
+
+class FanoutWorker:
+    """Copies newly published posts into the timelines of the author's followers.
+
+    Followers are walked in FANOUT_BATCH_SIZE chunks by keyset on follower_id;
+    each chunk is one multi-row INSERT committed on its own, so a huge
+    fan-out never holds one long transaction.
+
+    The queue lives in memory, so the author's own timeline row is written
+    last and marks a finished fan-out. At startup, ready posts of the last
+    FANOUT_RECOVERY_SECONDS without it are fanned out again; rows that made
+    it before the restart are skipped by the upsert.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=FANOUT_QUEUE_SIZE)
+        self.tasks = []
+        self.session_factory = None
+
+    async def start(self, session_factory):
+        self.session_factory = session_factory
+        self.tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._recover())]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _recover(self):
+        since = datetime.now(timezone.utc) - timedelta(seconds=FANOUT_RECOVERY_SECONDS)
+        finished = exists().where(and_(TimelineModel.user_id == Post.user_id, TimelineModel.post_id == Post.id))
+        async with self.session_factory() as db:
+            unfinished = (await db.execute(
+                select(Post.id).where(Post.status == "ready", Post.created_at >= since, ~finished)
+            )).scalars().all()
+        if unfinished:
+            logging.info(f"Resuming the fan-out of {len(unfinished)} posts")
+        for post_id in unfinished:
+            await self.submit(post_id)
+
+    async def submit(self, post_id):
+        await self.queue.put(post_id)
+
+    async def _run(self):
+        while True:
+            post_id = await self.queue.get()
+            try:
+                await self.fan_out(post_id)
+            except Exception:
+                logging.error(f"Fan-out of post {post_id} failed", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    async def fan_out(self, post_id):
+        async with self.session_factory() as db:
+            row = (await db.execute(
+                select(Post.user_id, Post.created_at, UserModel.followers_count)
+                .join(UserModel, UserModel.id == Post.user_id)
+                .where(Post.id == post_id)
+            )).first()
+            if row is None:
+                return
+            author_id, created_at, followers_count = row
+
+            def entry(user_id):
+                return {"user_id": user_id, "post_id": post_id, "author_id": author_id, "created_at": created_at}
+
+            last_follower = None
+            while not is_celebrity(followers_count):
+                query = select(FollowModel.follower_id).where(FollowModel.followee_id == author_id)
+                if last_follower is not None:
+                    query = query.where(FollowModel.follower_id > last_follower)
+                followers = (await db.execute(
+                    query.order_by(FollowModel.follower_id).limit(FANOUT_BATCH_SIZE)
+                )).scalars().all()
+                if not followers:
+                    break
+
+                await insert_timeline_rows(db, [entry(follower_id) for follower_id in followers])
+                await db.commit()
+                last_follower = followers[-1]
+
+            # The author always sees their own post; written last, it marks the fan-out done
+            await insert_timeline_rows(db, [entry(author_id)])
+            await db.commit()
+
+
+fanout_worker = FanoutWorker()
@@ -0,0 +1,65 @@
+from sqlalchemy import select
+
+from db import primary_session
+from models.post_model import Post
+from services.comments import latest_comments
+from services.feed_cache import feed_cache
+from services.like_buffer import like_buffer
+from services.pagination import feed_page
+from services.reads import post_fragment, select_posts
+from services.viewer_state import get_viewer_state
+
+
+async def load_page_ids(db, cursor, limit):
+    page_key, page = await feed_cache.get_page(cursor, limit)
+    if page is None:
+        query = select(Post.id, Post.created_at).where(Post.status == "ready")
+        async with primary_session(db) as source:
+            rows, next_cursor = await feed_page(source, query, Post.created_at, Post.id, cursor, limit,
+                                                key=lambda row: (row.created_at, row.id))
+        page = {"ids": [row.id for row in rows], "next_cursor": next_cursor}
+        await feed_cache.set_page(page_key, page["ids"], next_cursor)
+    return page["ids"], page["next_cursor"]
+
+
+async def load_fragments(db, post_ids):
+    fragments = await feed_cache.get_posts(post_ids)
+
+    missing = [post_id for post_id in post_ids if post_id not in fragments]
+    if missing:
+        # Cached for every viewer, so read where the latest write already is
+        async with primary_session(db) as source:
+            rows = (await source.execute(select_posts().where(Post.id.in_(missing)))).all()
+            previews = await latest_comments(source, [row.id for row in rows])
+        loaded = [post_fragment(row, previews[row.id]) for row in rows]
+        await feed_cache.set_posts(loaded)
+        fragments.update((fragment["id"], fragment) for fragment in loaded)
+
+    return fragments
+
+
+async def render_posts(db, user_id, post_ids):
+    """Feed entries for `post_ids`, in order, with the viewer's flags merged in.
+
+    Post bodies come from the feed cache when possible; only the viewer's own
+    like/save flags are always read fresh. Likes still in the write-behind
+    buffer are applied on top of both.
+    """
+    fragments = await load_fragments(db, post_ids)
+    liked_ids, saved_ids = await get_viewer_state(db, user_id, post_ids)
+    liked_ids = like_buffer.liked_ids(user_id, post_ids, liked_ids)
+
+    result = []
+    for post_id in post_ids:
+        # A post deleted since the page was cached simply drops out
+        fragment = fragments.get(post_id)
+        if fragment is None:
+            continue
+        result.append({
+            **fragment,
+            "likes_count": fragment["likes_count"] + like_buffer.likes_delta(post_id),
+            "liked_by_user": post_id in liked_ids,
+            "saved_by_user": post_id in saved_ids,
+        })
+
+    return result
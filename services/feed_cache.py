@@ -0,0 +1,213 @@
+import os
+
+import orjson
+
+from services.lru import TTLCache
+
+FEED_CACHE_BACKEND = os.getenv("FEED_CACHE_BACKEND", "memory")
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", "10000"))
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "30"))
+FEED_CACHE_REDIS_URL = os.getenv("FEED_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryBackend:
+    """Per-process backend. Each worker has its own copy, so an invalidation
+    on one worker reaches the others only through the TTL.
+
+    Counters are kept in an LRU of `maxsize` entries too. An evicted counter
+    comes back above every value this backend handed out so far, so it reads
+    as changed rather than repeating a version a client already has.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.data = TTLCache(maxsize, ttl)
+        self.counters = TTLCache(maxsize, float("inf"))
+        self.ceiling = 0
+
+    async def get_many(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set_many(self, items, ttl):
+        for key, value in items.items():
+            self.data.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.delete(key)
+
+    def _counter(self, key):
+        value = self.counters.get(key)
+        if value is None:
+            self.ceiling += 1
+            value = self.ceiling
+            self.counters.set(key, value)
+        return value
+
+    async def get_counter(self, key):
+        return self._counter(key)
+
+    async def get_counters(self, keys):
+        return [self._counter(key) for key in keys]
+
+    async def incr(self, key):
+        value = self._counter(key) + 1
+        self.counters.set(key, value)
+        self.ceiling = max(self.ceiling, value)
+        return value
+
+
+class RedisBackend:
+    """Backend for anything speaking the Redis protocol, shared by all workers.
+
+    `client` is a `redis.asyncio.Redis`-compatible client, e.g. a
+    `fakeredis.aioredis.FakeRedis` in tests.
+    """
+
+    def __init__(self, client, prefix="feed:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get_many(self, keys):
+        if not keys:
+            return []
+        values = await self.client.mget([self.prefix + key for key in keys])
+        return [orjson.loads(value) if value is not None else None for value in values]
+
+    async def set_many(self, items, ttl):
+        if not items:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self.prefix + key, orjson.dumps(value), px=int(ttl * 1000))
+            await pipe.execute()
+
+    async def delete(self, *keys):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def get_counter(self, key):
+        value = await self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    async def get_counters(self, keys):
+        values = await self.client.mget([self.prefix + key for key in keys])
+        return [int(value) if value is not None else 0 for value in values]
+
+    async def incr(self, key):
+        return await self.client.incr(self.prefix + key)
+
+
+class NullBackend:
+    async def get_many(self, keys):
+        return [None] * len(keys)
+
+    async def set_many(self, items, ttl):
+        pass
+
+    async def delete(self, *keys):
+        pass
+
+    async def get_counter(self, key):
+        return 0
+
+    async def get_counters(self, keys):
+        return [0] * len(keys)
+
+    async def incr(self, key):
+        return 0
+
+
+class FeedCache:
+    """Shared, viewer-independent fragments of the global feed.
+
+    - `page:<generation>:<limit>:<cursor>` holds the post ids of one feed
+      page and its next cursor. Creating a post bumps the generation, which
+      orphans every cached page at once.
+    - `post:<id>` holds one post as rendered in the feed, minus the viewer
+      specific `liked_by_user`/`saved_by_user` flags. Likes, saves and
+      comments on a post drop only that entry.
+    - `version:<scope>` counters are bumped on writes and back the ETags of
+      the polling endpoints (see services/etags.py): "feed" when the set of
+      posts on the pages changes, "post:<id>" when one post's likes, saves
+      or comments do, "user:<id>" for what one user sees of their own.
+    """
+
+    def __init__(self, backend=None, ttl=FEED_CACHE_TTL):
+        self._backend = backend
+        self.ttl = ttl
+        self.stats = {"page_hits": 0, "page_misses": 0, "post_hits": 0, "post_misses": 0}
+
+    @property
+    def backend(self):
+        # Built on first use, so importing the app opens no client
+        if self._backend is None:
+            self._backend = make_backend()
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+
+    async def get_page(self, cursor, limit):
+        generation = await self.backend.get_counter("generation")
+        key = f"page:{generation}:{limit}:{cursor or ''}"
+        page, = await self.backend.get_many([key])
+        self.stats["page_hits" if page is not None else "page_misses"] += 1
+        return key, page
+
+    async def set_page(self, key, ids, next_cursor):
+        await self.backend.set_many({key: {"ids": ids, "next_cursor": next_cursor}}, self.ttl)
+
+    async def get_posts(self, post_ids):
+        values = await self.backend.get_many([f"post:{post_id}" for post_id in post_ids])
+        found = {post_id: value for post_id, value in zip(post_ids, values) if value is not None}
+        self.stats["post_hits"] += len(found)
+        self.stats["post_misses"] += len(post_ids) - len(found)
+        return found
+
+    async def set_posts(self, posts):
+        await self.backend.set_many({f"post:{post['id']}": post for post in posts}, self.ttl)
+
+    async def invalidate_post(self, post_id):
+        await self.invalidate_posts([post_id])
+
+    async def invalidate_posts(self, post_ids):
+        if post_ids:
+            await self.backend.delete(*(f"post:{post_id}" for post_id in post_ids))
+            # Only feed pages showing these posts change, not every page
+            await self.bump(*(f"post:{post_id}" for post_id in post_ids))
+
+    async def invalidate_pages(self):
+        await self.backend.incr("generation")
+        await self.bump("feed")
+
+    async def versions(self, *scopes):
+        return await self.backend.get_counters([f"version:{scope}" for scope in scopes])
+
+    async def bump(self, *scopes):
+        """Advance the version of each scope ("feed", "post:<id>", "user:<id>") after a write."""
+        for scope in scopes:
+            await self.backend.incr(f"version:{scope}")
+
+    def snapshot(self):
+        data = dict(self.stats)
+        data["backend"] = type(self.backend).__name__
+        for kind in ("page", "post"):
+            total = data[f"{kind}_hits"] + data[f"{kind}_misses"]
+            data[f"{kind}_hit_ratio"] = round(data[f"{kind}_hits"] / total, 4) if total else None
+        return data
+
+
+def make_backend(name=FEED_CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend(FEED_CACHE_SIZE, FEED_CACHE_TTL)
+    if name == "redis":
+        import redis.asyncio
+
+        return RedisBackend(redis.asyncio.Redis.from_url(FEED_CACHE_REDIS_URL))
+    if name == "none":
+        return NullBackend()
+    raise ValueError(f"Unknown FEED_CACHE_BACKEND: {name}")
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def _build(ms, rand_a, rand_b):
+    # 48 bits of Unix milliseconds, version 7, 12 bits rand_a, variant 0b10, 62 bits rand_b
+    value = (ms & (2 ** 48 - 1)) << 80 | 0x7 << 76 | (rand_a & 0xFFF) << 64 | 0b10 << 62 | (rand_b & (2 ** 62 - 1))
+    return uuid.UUID(int=value)
+
+
+def uuid7():
+    """A new UUIDv7 (RFC 9562), ordered by creation time.
+
+    Ids made by this process are strictly increasing, even within one
+    millisecond: rand_a then works as a counter, starting at a random value.
+    Their text form sorts the same way, so newer rows always land at the
+    right edge of the primary key index.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms, _counter = ms, int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            # Same millisecond (or the clock went back): keep counting from the last id
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms, _counter = _last_ms + 1, 0
+        ms, counter = _last_ms, _counter
+    return _build(ms, counter, int.from_bytes(os.urandom(8), "big"))
+
+
+def new_id() -> str:
+    """Primary key for a new row."""
+    return str(uuid7())
+
+
+def id_at(moment: datetime, rand: int) -> str:
+    """The UUIDv7 of `moment`, with 74 caller supplied random bits.
+
+    Used to rekey existing rows by their created_at and to generate
+    reproducible data sets; ids of the same millisecond are ordered by `rand`.
+    """
+    if moment.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored in UTC
+        moment = moment.replace(tzinfo=timezone.utc)
+    ms = int(moment.timestamp() * 1000)
+    return str(_build(ms, rand >> 62, rand))
+
+
+def is_id(value) -> bool:
+    """Whether `value` can be compared with an id column; other strings match no row."""
+    try:
+        uuid.UUID(value)
+    except (ValueError, TypeError, AttributeError):
+        return False
+    return True
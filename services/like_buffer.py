@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from models.liked_model import LikedModel
+from models.post_model import Post
+from services.feed_cache import feed_cache
+from services.toggles import apply_toggles
+
+LIKE_WRITE_BEHIND = os.getenv("LIKE_WRITE_BEHIND", "false").lower() == "true"
+LIKE_FLUSH_INTERVAL = float(os.getenv("LIKE_FLUSH_INTERVAL", "1"))
+LIKE_FLUSH_SIZE = int(os.getenv("LIKE_FLUSH_SIZE", "1000"))
+
+
+class _Intents:
+    """Coalesced like intents: (user_id, post_id) -> (state in the database, wanted state)."""
+
+    def __init__(self):
+        self.entries = {}
+        self.deltas = Counter()
+        self.user_deltas = Counter()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, pair):
+        entry = self.entries.get(pair)
+        return entry[1] if entry else None
+
+    def set(self, pair, base, wanted):
+        old = self.entries.pop(pair, None)
+        if old is not None:
+            self.deltas[pair[1]] -= old[1] - old[0]
+            self.user_deltas[pair[0]] -= old[1] - old[0]
+        # Toggling back and forth cancels out and never reaches the database
+        if wanted != base:
+            self.entries[pair] = (base, wanted)
+            self.deltas[pair[1]] += wanted - base
+            self.user_deltas[pair[0]] += wanted - base
+
+
+class LikeBuffer:
+    """Write-behind buffer for like toggles, enabled with LIKE_WRITE_BEHIND.
+
+    A toggle only reads the current state and records the wanted one in
+    memory; repeated toggles by the same user collapse into one entry. Every
+    LIKE_FLUSH_INTERVAL seconds, or as soon as LIKE_FLUSH_SIZE entries are
+    waiting, the buffer is written with `apply_toggles`: one bulk DELETE, one
+    bulk INSERT and one counter UPDATE instead of a commit per click.
+
+    The buffer is per process. Reads in this process go through it (the
+    viewer's flags, the like counts, the user's liked count and liked list),
+    so users see their own likes right away; other processes see them after
+    the next flush. Whatever is still
+    buffered is flushed on shutdown.
+    """
+
+    def __init__(self, enabled=LIKE_WRITE_BEHIND):
+        self.enabled = enabled
+        self.pending = _Intents()
+        # Entries being written by the current flush, still visible to reads
+        self.flushing = _Intents()
+        self.lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.session_factory = None
+        self.stats = {"toggles": 0, "flushes": 0, "flushed_rows": 0}
+
+    async def start(self, session_factory):
+        self.session_factory = session_factory
+        if self.enabled:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.enabled:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), LIKE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.error("Flushing buffered likes failed", exc_info=True)
+
+    def _buffered(self, pair):
+        wanted = self.pending.get(pair)
+        return wanted if wanted is not None else self.flushing.get(pair)
+
+    async def toggle(self, db, user_id, post_id):
+        """Flip the like of `user_id` on `post_id` in the buffer. Returns the new state."""
+        pair = (user_id, post_id)
+        current = self._buffered(pair)
+        if current is None:
+            liked = select(LikedModel.id).where(
+                LikedModel.user_id == user_id, LikedModel.post_id == post_id
+            ).exists()
+            row = (await db.execute(select(Post.id, liked).where(Post.id == post_id))).first()
+            if row is None:
+                raise HTTPException(status_code=404, detail="Post not found!")
+            current = row[1]
+
+        # The state the database will have once earlier flushes land
+        if pair in self.pending.entries:
+            base = self.pending.entries[pair][0]
+        elif pair in self.flushing.entries:
+            base = self.flushing.entries[pair][1]
+        else:
+            base = current
+        self.pending.set(pair, base, not current)
+        # The overlay changes the post wherever it is shown, and this user's lists
+        await feed_cache.bump(f"post:{post_id}", f"user:{user_id}")
+
+        self.stats["toggles"] += 1
+        if len(self.pending) >= LIKE_FLUSH_SIZE:
+            self.wakeup.set()
+        return not current
+
+    def liked_ids(self, user_id, post_ids, liked_ids):
+        """`liked_ids` as read from the database, corrected with buffered intents."""
+        if not self.enabled:
+            return liked_ids
+        liked_ids = set(liked_ids)
+        for post_id in post_ids:
+            wanted = self._buffered((user_id, post_id))
+            if wanted is True:
+                liked_ids.add(post_id)
+            elif wanted is False:
+                liked_ids.discard(post_id)
+        return liked_ids
+
+    def likes_delta(self, post_id):
+        """Buffered change of a post's like count not yet in the database."""
+        if not self.enabled:
+            return 0
+        return self.pending.deltas[post_id] + self.flushing.deltas[post_id]
+
+    def liked_count_delta(self, user_id):
+        """Buffered change of how many posts `user_id` likes."""
+        if not self.enabled:
+            return 0
+        return self.pending.user_deltas[user_id] + self.flushing.user_deltas[user_id]
+
+    def user_likes(self, user_id):
+        """Buffered likes of `user_id` as {post_id: wanted state}, oldest toggle first."""
+        if not self.enabled:
+            return {}
+        likes = {}
+        for intents in (self.flushing, self.pending):
+            for (owner, post_id), (_, wanted) in intents.entries.items():
+                if owner == user_id:
+                    likes.pop(post_id, None)
+                    likes[post_id] = wanted
+        return likes
+
+    def _restore(self, batch):
+        """Merge a batch whose flush failed back in front of the newer toggles.
+
+        The database still holds the batch's base states, so those stay the
+        bases; a toggle made during the flush only changes the wanted state.
+        """
+        merged = _Intents()
+        for pair, (base, wanted) in batch.entries.items():
+            newer = self.pending.entries.get(pair)
+            merged.set(pair, base, newer[1] if newer else wanted)
+        for pair, (base, wanted) in self.pending.entries.items():
+            if pair not in batch.entries:
+                merged.set(pair, base, wanted)
+        self.pending = merged
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, _Intents()
+            self.flushing = batch
+            try:
+                async with self.session_factory() as db:
+                    intents = batch.entries
+                    # Posts deleted meanwhile would break the bulk INSERT's foreign key
+                    existing = set((await db.execute(
+                        select(Post.id).where(Post.id.in_(list({post_id for _, post_id in intents})))
+                    )).scalars().all())
+                    adds = {pair for pair, (_, wanted) in intents.items() if wanted and pair[1] in existing}
+                    removes = {pair for pair, (_, wanted) in intents.items() if not wanted}
+                    added, removed = await apply_toggles(db, LikedModel, Post.likes_count, adds, removes)
+            except Exception:
+                # Nothing was written: keep the batch, with any toggle made meanwhile on top
+                self._restore(batch)
+                self.flushing = _Intents()
+                raise
+
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += len(added) + len(removed)
+            try:
+                # Drop stale counts before the overlay disappears
+                await feed_cache.invalidate_posts({post_id for _, post_id in added | removed})
+                await feed_cache.bump(*{f"user:{user_id}" for user_id, _ in added | removed})
+            finally:
+                # The rows are committed, so a cache failure must not replay them
+                self.flushing = _Intents()
+
+    def snapshot(self):
+        return {**self.stats, "enabled": self.enabled, "pending": len(self.pending)}
+
+
+like_buffer = LikeBuffer()
@@ -0,0 +1,186 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# Upper bounds (seconds) of the request latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the SQL statements per request histogram
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# SQL usage of the request being served; None outside requests (background workers)
+current_request = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _labels(**values):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in values.values())
+    return ",".join(f'{name}="{value}"' for name, value in zip(values, escaped))
+
+
+class Metrics:
+    """Request and SQL metrics of this process, rendered in the Prometheus text format.
+
+    Requests are labelled with their route template (`/post/{post_id}/comments`),
+    not the raw path, so the number of series stays bounded. SQL statements are
+    attributed to the request that issued them through `current_request`;
+    statements from background workers are labelled `route="background"`.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = Counter()
+        self.latency = {}
+        self.statements_per_request = {}
+        self.statements = Counter()
+        self.statement_seconds = Counter()
+
+    def observe_request(self, method, route, status, seconds, usage):
+        self.requests[(method, route, status)] += 1
+        self.latency.setdefault((method, route), Histogram(LATENCY_BUCKETS)).observe(seconds)
+        self.statements_per_request.setdefault(
+            (method, route), Histogram(STATEMENT_BUCKETS)
+        ).observe(usage["statements"])
+        self.statements[(method, route)] += usage["statements"]
+        self.statement_seconds[(method, route)] += usage["seconds"]
+
+    def observe_statement(self, seconds):
+        usage = current_request.get()
+        if usage is None:
+            self.statements[("", "background")] += 1
+            self.statement_seconds[("", "background")] += seconds
+        else:
+            usage["statements"] += 1
+            usage["seconds"] += seconds
+
+    def render(self):
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests by method, route and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), n in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {n}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by method and route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.latency.items()):
+            lines += histogram.lines("http_request_duration_seconds", _labels(method=method, route=route))
+
+        lines += [
+            "# HELP db_statements_per_request SQL statements issued by one request.",
+            "# TYPE db_statements_per_request histogram",
+        ]
+        for (method, route), histogram in sorted(self.statements_per_request.items()):
+            lines += histogram.lines("db_statements_per_request", _labels(method=method, route=route))
+
+        lines += [
+            "# HELP db_statements_total SQL statements by the route that issued them.",
+            "# TYPE db_statements_total counter",
+        ]
+        for (method, route), n in sorted(self.statements.items()):
+            lines.append(f"db_statements_total{{{_labels(method=method, route=route)}}} {n}")
+
+        lines += [
+            "# HELP db_statement_duration_seconds_total Time spent executing SQL by route.",
+            "# TYPE db_statement_duration_seconds_total counter",
+        ]
+        for (method, route), seconds in sorted(self.statement_seconds.items()):
+            lines.append(f"db_statement_duration_seconds_total{{{_labels(method=method, route=route)}}} {seconds}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def route_template(scope):
+    """The matched route as a template, e.g. `/post/{post_id}/comments`.
+
+    Rebuilt from the request path and its path parameters, since routes
+    included from a router may only know their path relative to its prefix.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{params[part]}}}" if part in params else part for part in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and collecting its SQL usage."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        usage = {"statements": 0, "seconds": 0.0}
+        token = current_request.set(usage)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            current_request.reset(token)
+            metrics.observe_request(scope["method"], route_template(scope), status,
+                                    time.perf_counter() - start, usage)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        metrics.observe_statement(time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            metrics.observe_statement(time.perf_counter() - conn.info["query_start"].pop())
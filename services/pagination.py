@@ -0,0 +1,135 @@
+import base64
+import json
+import os
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import String, and_, literal, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Order feeds by primary key alone. Only correct once every post id is
+# time-ordered: new ids are UUIDv7, older rows are rekeyed by scripts/rekey_ids.py
+ID_ORDERED_FEED = os.getenv("ID_ORDERED_FEED", "false").lower() == "true"
+
+
+def _pack(values) -> str:
+    # Keep the cursor opaque so clients only ever pass it back unchanged
+    payload = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _unpack(cursor: str):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def _id(value) -> str:
+    # Compared against uuid columns, so anything else is rejected up front
+    return str(uuid.UUID(value))
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    return _pack([created_at.isoformat(), id])
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, id = _unpack(cursor)
+        return datetime.fromisoformat(created_at), _id(id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_id_cursor(id: str) -> str:
+    return _pack([id])
+
+
+def decode_id_cursor(cursor: str):
+    # The id is always last, so `(created_at, id)` cursors handed out before
+    # ID_ORDERED_FEED was turned on keep working
+    try:
+        return _id(_unpack(cursor)[-1])
+    except (ValueError, TypeError, AttributeError, IndexError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_rank_cursor(rank: float, id: str) -> str:
+    """Cursor for result lists ordered by a relevance score instead of time."""
+    return _pack([rank, id])
+
+
+def decode_rank_cursor(cursor: str):
+    try:
+        rank, id = _unpack(cursor)
+        return float(rank), _id(id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _before(db, created_col, id_col, created_at, id):
+    if db.get_bind().dialect.name == "sqlite" and not created_at.microsecond:
+        # SQLite stores server defaults (CURRENT_TIMESTAMP) as text without the
+        # fraction the driver writes, so a whole second has two spellings
+        second = literal(created_at.strftime("%Y-%m-%d %H:%M:%S"), String)
+        return or_(
+            created_col < second,
+            and_(or_(created_col == second, created_col == created_at), id_col < id),
+        )
+    return or_(
+        created_col < created_at,
+        and_(created_col == created_at, id_col < id),
+    )
+
+
+async def keyset_page(db, query, created_col, id_col, cursor, limit, key):
+    """Run `query` with `(created_at, id)` keyset pagination, newest first.
+
+    `query` is a column-level select; `key` maps one of its rows to the
+    `(created_at, id)` pair. Returns the rows of the page and the cursor for
+    the next one (None on the last page).
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.where(_before(db, created_col, id_col, created_at, id))
+
+    result = await db.execute(query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+
+    return rows, next_cursor
+
+
+async def id_page(db, query, id_col, cursor, limit, key):
+    """Run `query` with keyset pagination on `id_col` alone, newest first.
+
+    For time-ordered ids: the primary key index serves both the order and the
+    cursor. `key` maps a result row to its id.
+    """
+    if cursor:
+        query = query.where(id_col < decode_id_cursor(cursor))
+
+    result = await db.execute(query.order_by(id_col.desc()).limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_id_cursor(key(rows[-1]))
+
+    return rows, next_cursor
+
+
+async def feed_page(db, query, created_col, id_col, cursor, limit, key):
+    """keyset_page for feeds, or id_page when ID_ORDERED_FEED is on.
+
+    `key` maps a result row to its `(created_at, id)` pair.
+    """
+    if ID_ORDERED_FEED:
+        return await id_page(db, query, id_col, cursor, limit, key=lambda row: key(row)[1])
+    return await keyset_page(db, query, created_col, id_col, cursor, limit, key)
@@ -0,0 +1,73 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import bcrypt
+from fastapi import HTTPException
+
+# Work factor for new hashes; stored hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "16"))
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(os.cpu_count() or 1)))
+# Hashing jobs allowed to run or wait at once before new ones get a 503
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_POOL_SIZE * 4)))
+
+_executor = None
+_in_flight = 0
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # spawn keeps the workers free of the event loop and threads of the parent
+        _executor = ProcessPoolExecutor(
+            max_workers=HASH_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(fn, *args):
+    global _in_flight
+    if _in_flight >= HASH_QUEUE_LIMIT:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again",
+                            headers={"Retry-After": "1"})
+
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), partial(fn, *args))
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str) -> bytes:
+    return await _run(_hash, password.encode(), BCRYPT_ROUNDS)
+
+
+async def verify_password(password: str, hashed: bytes) -> bool:
+    return await _run(_check, password.encode(), hashed)
+
+
+def needs_rehash(hashed: bytes) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed.split(b"$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
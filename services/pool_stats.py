@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            waits = sum(self.wait_buckets)
+            buckets = {f"le_{bound}": n for bound, n in zip(WAIT_BUCKETS, self.wait_buckets)}
+            buckets["le_inf"] = self.wait_buckets[-1]
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_histogram": buckets,
+            }
+        # Live gauges straight from the pool; StaticPool/NullPool lack some of them
+        for name in ("size", "checkedout", "overflow", "checkedin"):
+            getter = getattr(pool, name, None)
+            data[name] = getter() if getter else None
+        return data
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that times how long each checkout waits for a connection.
+
+    The pool events only fire once a connection has been handed out, so the
+    wait itself (and timeouts, which never reach an event) is measured here.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+def instrument_pool(pool):
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_stats.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_stats.checkouts += 1
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_stats.checkins += 1
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_stats.invalidations += 1
+
+
+async def prewarm(engine, count):
+    """Open `count` connections up front so the first requests don't pay for it."""
+    size = getattr(engine.pool, "size", None)
+    count = min(count, size()) if size else 0
+    if count <= 0:
+        return
+    conns = await asyncio.gather(*(engine.connect() for _ in range(count)))
+    for conn in conns:
+        await conn.close()
@@ -0,0 +1,82 @@
+from sqlalchemy import func, select
+
+from models.liked_model import LikedModel
+from models.post_model import Post
+from models.saved_model import SavedModel
+from models.user_model import UserModel
+from services.like_buffer import like_buffer
+from services.pagination import keyset_page
+from services.reads import POST_SUMMARY_COLUMNS, post_summary, select_posts
+from services.viewer_state import get_viewer_state
+
+# Relations /auth/me can embed with ?include=, and the table behind each
+RELATIONS = {
+    "liked_posts": LikedModel,
+    "saved_posts": SavedModel,
+}
+
+
+def _count(model, column):
+    return select(func.count()).select_from(model).where(column == UserModel.id).scalar_subquery()
+
+
+async def load_profile(db, user_id):
+    """The user's profile with its aggregate counts, in one query; None if the user is gone.
+
+    Each count is a subquery answered from an index on `user_id`, so its cost
+    does not depend on how many likes or saves the rows behind it hold.
+    """
+    row = (await db.execute(select(
+        UserModel.id,
+        UserModel.username,
+        UserModel.email,
+        UserModel.followers_count,
+        UserModel.following_count,
+        select(func.count()).select_from(Post)
+        .where(Post.user_id == UserModel.id, Post.status == "ready").scalar_subquery().label("posts_count"),
+        _count(LikedModel, LikedModel.user_id).label("liked_count"),
+        _count(SavedModel, SavedModel.user_id).label("saved_count"),
+    ).where(UserModel.id == user_id))).first()
+    if row is None:
+        return None
+    profile = dict(row._mapping)
+    # Likes still waiting in this process's write-behind buffer count already
+    profile["liked_count"] += like_buffer.liked_count_delta(user_id)
+    return profile
+
+
+async def user_post_page(db, model, user_id, cursor, limit):
+    """One page of the posts `user_id` liked or saved (`model`), most recent first.
+
+    Likes still in the write-behind buffer have no row yet: the ones made
+    lead the first page, as the newest, and the ones taken back are left
+    out. With `limit` or more buffered, that page runs past `limit`.
+    """
+    buffered = like_buffer.user_likes(user_id) if model is LikedModel else {}
+    fresh = []
+    if cursor is None:
+        fresh_ids = [post_id for post_id, wanted in reversed(buffered.items()) if wanted]
+        if fresh_ids:
+            found = {row.id: row for row in (await db.execute(
+                select_posts(POST_SUMMARY_COLUMNS).where(Post.id.in_(fresh_ids), Post.status == "ready")
+            )).all()}
+            fresh = [found[post_id] for post_id in fresh_ids if post_id in found]
+
+    # The like/save row's own keys drive the order; its name clashes with the post's columns
+    query = (
+        select(model.id.label("entry_id"), model.created_at.label("entry_created_at"), *POST_SUMMARY_COLUMNS)
+        .join(Post, Post.id == model.post_id)
+        .join(UserModel, UserModel.id == Post.user_id)
+        # Like the feed: pending and failed uploads have no image to show yet
+        .where(model.user_id == user_id, Post.status == "ready")
+    )
+    rows, next_cursor = await keyset_page(db, query, model.created_at, model.id, cursor, max(limit - len(fresh), 1),
+                                          key=lambda row: (row.entry_created_at, row.entry_id))
+    # Taken back, or already among `fresh` while its flush commits
+    shown = {row.id for row in fresh}
+    rows = fresh + [row for row in rows if row.id not in shown and buffered.get(row.id) is not False]
+
+    post_ids = [row.id for row in rows]
+    liked_ids, saved_ids = await get_viewer_state(db, user_id, post_ids)
+    liked_ids = like_buffer.liked_ids(user_id, post_ids, liked_ids)
+    return [post_summary(row, liked_ids, saved_ids) for row in rows], next_cursor
@@ -0,0 +1,198 @@
+import os
+import re
+import secrets
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from services.lru import TTLCache
+
+# Profile every request, e.g. on a staging box; otherwise only on request
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# Statements slower than this get an EXPLAIN captured
+SQL_PROFILE_SLOW_MS = float(os.getenv("SQL_PROFILE_SLOW_MS", "100"))
+# The same statement shape this many times in one request is reported as N+1
+SQL_PROFILE_REPEAT = int(os.getenv("SQL_PROFILE_REPEAT", "3"))
+SQL_PROFILE_KEEP = int(os.getenv("SQL_PROFILE_KEEP", "100"))
+SQL_PROFILE_TTL = float(os.getenv("SQL_PROFILE_TTL", "600"))
+
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN (ANALYZE, BUFFERS) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+# Statements collected for the request being profiled; None when profiling is off
+current_profile = ContextVar("current_profile", default=None)
+reports = TTLCache(SQL_PROFILE_KEEP, SQL_PROFILE_TTL)
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|\$\d+|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|\$\d+|%\(\w+\)s|:\w+))*\s*\)")
+_NUMBERED = re.compile(r"\$\d+")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """Normalize a statement so that repeats differing only in parameters compare equal.
+
+    `IN` lists are collapsed to one placeholder since their length follows
+    the number of bound values.
+    """
+    shape = _SPACES.sub(" ", statement).strip()
+    shape = _NUMBERED.sub("?", shape)
+    return _PLACEHOLDER_LIST.sub("(?)", shape)
+
+
+class Profile:
+    def __init__(self, method, path):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.statements = []
+
+    def record(self, statement, seconds, plan=None):
+        entry = {"sql": statement, "duration_ms": round(seconds * 1000, 3)}
+        if plan is not None:
+            entry["plan"] = plan
+        self.statements.append(entry)
+
+    def report(self, status):
+        shapes = Counter()
+        shape_ms = Counter()
+        for entry in self.statements:
+            shape = statement_shape(entry["sql"])
+            shapes[shape] += 1
+            shape_ms[shape] += entry["duration_ms"]
+
+        repeated = [
+            {"shape": shape, "count": count, "total_ms": round(shape_ms[shape], 3)}
+            for shape, count in shapes.most_common() if count >= SQL_PROFILE_REPEAT
+        ]
+        slow = [entry for entry in self.statements if entry["duration_ms"] >= SQL_PROFILE_SLOW_MS]
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "request_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "statement_count": len(self.statements),
+            "sql_ms": round(sum(entry["duration_ms"] for entry in self.statements), 3),
+            "repeated": repeated,
+            "slow": slow,
+            "statements": self.statements,
+        }
+
+
+def summary_header(report):
+    return (f"id={report['id']}; statements={report['statement_count']}; "
+            f"sql_ms={report['sql_ms']}; repeated={len(report['repeated'])}; slow={len(report['slow'])}")
+
+
+def parse_summary(header):
+    """The X-SQL-Profile header back into a dict, as used by the query budget helper."""
+    fields = dict(part.strip().split("=", 1) for part in header.split(";"))
+    return {
+        "id": fields["id"],
+        "statements": int(fields["statements"]),
+        "sql_ms": float(fields["sql_ms"]),
+        "repeated": int(fields["repeated"]),
+        "slow": int(fields["slow"]),
+    }
+
+
+def _requested(headers):
+    # Per request profiling is for operators only: it needs the internal token too
+    if headers.get(b"x-sql-profile") is None:
+        return False
+    expected = os.getenv("INTERNAL_TOKEN")
+    token = headers.get(b"x-internal-token")
+    return bool(expected and token and secrets.compare_digest(token.decode(), expected))
+
+
+class ProfilerMiddleware:
+    """Collects the SQL of profiled requests and reports on it.
+
+    A request is profiled when SQL_PROFILE is on, or when it carries an
+    `X-SQL-Profile` header together with a valid `X-Internal-Token`. The
+    response then gets an `X-SQL-Profile` summary header, and the full JSON
+    report (every statement, repeated shapes, slow statements with their
+    plans) is kept for SQL_PROFILE_TTL seconds at
+    `/internal/sql-profile/<id>`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SQL_PROFILE or _requested(dict(scope["headers"]))):
+            return await self.app(scope, receive, send)
+
+        profile = Profile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+
+        async def send_with_report(message):
+            if message["type"] == "http.response.start":
+                report = profile.report(message["status"])
+                reports.set(profile.id, report)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-sql-profile", summary_header(report).encode()),
+                    (b"x-sql-profile-report", f"/internal/sql-profile/{profile.id}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_report)
+        finally:
+            current_profile.reset(token)
+
+
+def _explain(conn, statement, parameters):
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    # A fresh DBAPI cursor, so the result of the profiled statement is left alone
+    cursor = conn.connection.cursor()
+    # On Postgres a failed EXPLAIN would abort the request's transaction
+    savepoint = conn.dialect.name == "postgresql"
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT sql_profile_explain")
+        cursor.execute(prefix + statement, parameters)
+        plan = [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT sql_profile_explain")
+        return plan
+    except Exception as e:
+        if savepoint:
+            cursor.execute("ROLLBACK TO SAVEPOINT sql_profile_explain")
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+
+def profile_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is None or not conn.info.get("profile_start"):
+            return
+        seconds = time.perf_counter() - conn.info["profile_start"].pop()
+        plan = None
+        if seconds * 1000 >= SQL_PROFILE_SLOW_MS and not executemany:
+            plan = _explain(conn, statement, parameters)
+        profile.record(statement, seconds, plan)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        profile = current_profile.get()
+        conn = exception_context.connection
+        if profile is not None and conn is not None and conn.info.get("profile_start"):
+            seconds = time.perf_counter() - conn.info["profile_start"].pop()
+            profile.record(exception_context.statement or "", seconds)
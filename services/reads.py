@@ -0,0 +1,94 @@
+"""Column-level reads for the list endpoints.
+
+Lists only need a few columns of a post, its author and its comments. They
+are selected with Core `select(...)` over the joined tables and each `Row`
+is turned into a response dict directly, so no ORM objects, identity map
+entries or relationship loaders are created per row.
+"""
+from sqlalchemy import select
+
+from models.comment_model import CommentModel
+from models.post_model import Post
+from models.user_model import UserModel
+
+AUTHOR_COLUMNS = (UserModel.username, UserModel.email)
+
+# What PostSummary shows; the author's id is the post's user_id
+POST_SUMMARY_COLUMNS = (
+    Post.id,
+    Post.image_url,
+    Post.caption,
+    Post.created_at,
+    Post.updated_at,
+    Post.user_id,
+    *AUTHOR_COLUMNS,
+)
+
+# What a feed entry shows besides the viewer's flags and the comment preview
+POST_COLUMNS = POST_SUMMARY_COLUMNS + (Post.likes_count, Post.saves_count, Post.comments_count)
+
+COMMENT_COLUMNS = (
+    CommentModel.id,
+    CommentModel.content,
+    CommentModel.created_at,
+    CommentModel.updated_at,
+    CommentModel.user_id,
+    *AUTHOR_COLUMNS,
+)
+
+
+def select_posts(columns=POST_COLUMNS):
+    """`columns` of posts joined with their authors."""
+    return select(*columns).join(UserModel, UserModel.id == Post.user_id)
+
+
+def select_comments():
+    """Comments joined with their authors."""
+    return select(*COMMENT_COLUMNS).join(UserModel, UserModel.id == CommentModel.user_id)
+
+
+def author_dict(row):
+    return {
+        "id": row.user_id,
+        "username": row.username,
+        "email": row.email
+    }
+
+
+def comment_dict(row):
+    return {
+        "id": row.id,
+        "content": row.content,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "user": author_dict(row)
+    }
+
+
+def post_summary(row, liked_ids, saved_ids):
+    return {
+        "id": row.id,
+        "image_url": row.image_url,
+        "caption": row.caption,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "liked_by_user": row.id in liked_ids,
+        "saved_by_user": row.id in saved_ids,
+        "user": author_dict(row)
+    }
+
+
+def post_fragment(row, comments):
+    """The viewer-independent part of a feed entry."""
+    return {
+        "id": row.id,
+        "image_url": row.image_url,
+        "caption": row.caption,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "likes_count": row.likes_count,
+        "saves_count": row.saves_count,
+        "comments_count": row.comments_count,
+        "comments": comments,
+        "user": author_dict(row)
+    }
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from sqlalchemy import text
+
+from services.feed_cache import feed_cache
+from services.lru import TTLCache
+
+# After a user's write, their reads stay on the primary this long (read-your-writes).
+# Keep it above the replication lag REPLICA_MAX_LAG allows.
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+READ_YOUR_WRITES_SIZE = int(os.getenv("READ_YOUR_WRITES_SIZE", "100000"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_CHECK_TIMEOUT = float(os.getenv("REPLICA_CHECK_TIMEOUT", "1"))
+# A replica further behind than this (seconds) is skipped like a down one
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Seconds of WAL not yet replayed; 0 when caught up, so an idle primary does not count as lag
+POSTGRES_LAG = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def session_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ReplicaSet:
+    """Read replicas, their health, and which sessions must read from the primary.
+
+    A background task checks every replica each REPLICA_CHECK_INTERVAL seconds
+    (the replay lag on Postgres, a trivial query elsewhere). `pick` hands out the
+    healthy ones round robin and returns None, meaning the primary, when there
+    are none or when the session wrote within READ_YOUR_WRITES_WINDOW.
+
+    Write marks go to the feed cache backend, so with FEED_CACHE_BACKEND=redis
+    a write on one worker keeps the session's reads on the primary on every
+    worker. A copy is kept in this process too, which is all there is with
+    the memory or none backends.
+    """
+
+    def __init__(self):
+        self.engines = []
+        self.healthy = []
+        self.status = {}
+        self.sticky = TTLCache(READ_YOUR_WRITES_SIZE, READ_YOUR_WRITES_WINDOW)
+        self.next = 0
+        self.task = None
+
+    async def start(self, engines):
+        self.engines = list(engines)
+        if self.engines:
+            # Nothing is routed to a replica before it passed one check
+            await self.check()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.engines = []
+        self.healthy = []
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+            try:
+                await self.check()
+            except Exception:
+                logging.error("Checking read replicas failed", exc_info=True)
+
+    async def _probe(self, engine):
+        async with asyncio.timeout(REPLICA_CHECK_TIMEOUT):
+            async with engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    return float((await conn.execute(text(POSTGRES_LAG))).scalar() or 0)
+                # A table every read needs, so an empty or half copied file fails too
+                await conn.execute(text("SELECT 1 FROM users LIMIT 1"))
+                return 0.0
+
+    async def check(self):
+        results = await asyncio.gather(*(self._probe(engine) for engine in self.engines), return_exceptions=True)
+        healthy = []
+        for engine, result in zip(self.engines, results):
+            name = engine.url.render_as_string(hide_password=True)
+            if isinstance(result, BaseException):
+                error = f"{type(result).__name__}: {result}"
+            elif result > REPLICA_MAX_LAG:
+                error = f"lag {result:.1f}s over {REPLICA_MAX_LAG}s"
+            else:
+                error = None
+                healthy.append(engine)
+
+            was_healthy = self.status.get(name, {}).get("healthy")
+            if error and was_healthy is not False:
+                logging.warning(f"Read replica {name} taken out of rotation: {error}")
+            elif not error and was_healthy is False:
+                logging.info(f"Read replica {name} back in rotation")
+            self.status[name] = {
+                "healthy": error is None,
+                "lag_seconds": None if isinstance(result, BaseException) else result,
+                "error": error,
+                "checked_at": time.time(),
+            }
+        self.healthy = healthy
+
+    async def mark_write(self, token):
+        key = session_key(token)
+        self.sticky.set(key, True)
+        await feed_cache.backend.set_many({f"wrote:{key}": True}, READ_YOUR_WRITES_WINDOW)
+
+    async def wrote_recently(self, token):
+        key = session_key(token)
+        if self.sticky.get(key):
+            return True
+        marked, = await feed_cache.backend.get_many([f"wrote:{key}"])
+        return marked is not None
+
+    async def pick(self, token=None):
+        if not self.healthy:
+            return None
+        if token and await self.wrote_recently(token):
+            return None
+        self.next = (self.next + 1) % len(self.healthy)
+        return self.healthy[self.next]
+
+    def snapshot(self):
+        return {
+            "replicas": self.status,
+            "healthy": len(self.healthy),
+            # Marks of this worker only; the shared ones live in the feed cache backend
+            "sticky_sessions": len(self.sticky),
+            "read_your_writes_window": READ_YOUR_WRITES_WINDOW,
+        }
+
+
+replicas = ReplicaSet()
+
+
+class ReadYourWritesMiddleware:
+    """Marks the session of every successful write so its next reads go to the primary.
+
+    Any authenticated request other than GET/HEAD/OPTIONS counts as a write;
+    sessions are told apart by their auth token.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not replicas.engines:
+            return await self.app(scope, receive, send)
+
+        token = dict(scope["headers"]).get(b"x-auth-token")
+
+        async def send_marking(message):
+            # Marked before the response leaves, so the client's next read already sees it
+            if message["type"] == "http.response.start" and token and message["status"] < 400:
+                await replicas.mark_write(token.decode())
+            await send(message)
+
+        await self.app(scope, receive, send_marking)
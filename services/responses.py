@@ -0,0 +1,14 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson in a single pass.
+
+    Routes that return this directly skip FastAPI's `jsonable_encoder` walk
+    and response model validation; datetimes are serialized natively. The
+    route's `response_model` still documents the shape in OpenAPI.
+    """
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
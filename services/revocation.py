@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from models.revoked_token_model import RevokedTokenModel
+from services.lru import TTLCache
+
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", "100000"))
+REVOCATION_FALSE_POSITIVE_RATE = float(os.getenv("REVOCATION_FALSE_POSITIVE_RATE", "0.001"))
+# How often other workers' revocations are pulled in, and expired ones dropped
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))
+# created_at is when the signout's transaction started (now() on Postgres), so a
+# row can commit after newer ones were already pulled in. Each refresh reads back
+# this far, which must exceed the longest signout transaction.
+REVOCATION_REFRESH_OVERLAP = float(os.getenv("REVOCATION_REFRESH_OVERLAP", "300"))
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: two 64 bit halves of one sha256 give every position
+        digest = hashlib.sha256(key.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationList:
+    """In-memory view of the `revoked_tokens` table.
+
+    A Bloom filter answers the common case (token not revoked) without
+    touching the database. Only a positive answer, i.e. a revoked token or a
+    rare false positive, is confirmed with a primary key lookup.
+    """
+
+    def __init__(self):
+        self.bloom = BloomFilter(REVOCATION_CAPACITY, REVOCATION_FALSE_POSITIVE_RATE)
+        self.confirmed = TTLCache(10000, REVOCATION_REBUILD_SECONDS)
+        self.last_seen = None
+
+    def add(self, jti):
+        self.bloom.add(jti)
+        self.confirmed.set(jti, True)
+
+    async def is_revoked(self, session_factory, jti):
+        if jti not in self.bloom:
+            return False
+
+        revoked = self.confirmed.get(jti)
+        if revoked is None:
+            async with session_factory() as db:
+                revoked = await db.get(RevokedTokenModel, jti) is not None
+            self.confirmed.set(jti, revoked)
+        return revoked
+
+    async def rebuild(self, session_factory):
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(RevokedTokenModel.jti, RevokedTokenModel.created_at)
+                .where(RevokedTokenModel.expires_at > datetime.now(timezone.utc))
+            )).all()
+
+        capacity = max(REVOCATION_CAPACITY, len(rows) * 2)
+        bloom = BloomFilter(capacity, REVOCATION_FALSE_POSITIVE_RATE)
+        for jti, _ in rows:
+            bloom.add(jti)
+
+        self.bloom = bloom
+        self.confirmed.clear()
+        self.last_seen = max((created_at for _, created_at in rows if created_at), default=self.last_seen)
+
+    async def refresh(self, session_factory):
+        # Only rows written since the last sync, e.g. by signouts on other workers,
+        # plus the overlap for rows that committed late
+        query = select(RevokedTokenModel.jti, RevokedTokenModel.created_at)
+        if self.last_seen is not None:
+            since = self.last_seen - timedelta(seconds=REVOCATION_REFRESH_OVERLAP)
+            query = query.where(RevokedTokenModel.created_at >= since)
+
+        async with session_factory() as db:
+            rows = (await db.execute(query)).all()
+
+        for jti, created_at in rows:
+            # Rows read again in the overlap must not count twice towards the capacity
+            if jti not in self.bloom:
+                self.bloom.add(jti)
+            self.confirmed.set(jti, True)
+            if created_at and (self.last_seen is None or created_at > self.last_seen):
+                self.last_seen = created_at
+
+        if self.bloom.count > self.bloom.capacity:
+            await self.rebuild(session_factory)
+
+    async def run(self, session_factory):
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(REVOCATION_REFRESH_SECONDS)
+            elapsed += REVOCATION_REFRESH_SECONDS
+            try:
+                if elapsed >= REVOCATION_REBUILD_SECONDS:
+                    elapsed = 0.0
+                    await self.rebuild(session_factory)
+                else:
+                    await self.refresh(session_factory)
+            except Exception:
+                logging.error("Refreshing revoked tokens failed", exc_info=True)
+
+
+revocations = RevocationList()
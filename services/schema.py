@@ -0,0 +1,79 @@
+import ast
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from models.base_model import Base
+from services.search import ensure_search_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local runs and tests only: build the tables from the models instead of migrating
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "false").lower() == "true"
+
+
+_REVISION = re.compile(r"^(down_revision|revision)\b[^=]*=\s*(.+)$", re.MULTILINE)
+
+
+def expected_heads():
+    """Head revisions of the migrations shipped with this code.
+
+    Read straight from the revision headers of alembic/versions; importing
+    Alembic and loading every script would cost more than the rest of the
+    startup together.
+    """
+    revisions, parents = set(), set()
+    versions = os.path.join(ROOT, "alembic", "versions")
+    for name in os.listdir(versions):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(versions, name)) as f:
+            header = dict(_REVISION.findall(f.read()))
+        if "revision" not in header:
+            continue
+        revisions.add(ast.literal_eval(header["revision"]))
+        down = ast.literal_eval(header.get("down_revision", "None"))
+        # Merge revisions have a tuple of parents
+        parents.update(down if isinstance(down, (tuple, list)) else [down] if down else [])
+    return revisions - parents
+
+
+async def current_revisions(conn):
+    try:
+        return set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars())
+    except DBAPIError:
+        # Never migrated: there is no alembic_version table at all
+        await conn.rollback()
+        return set()
+
+
+async def check_schema(engine):
+    """Refuse to start against a database that is not migrated to this code's head.
+
+    One SELECT on alembic_version replaces running create_all in every
+    worker; migrations are applied once per deploy with `alembic upgrade head`.
+    """
+    heads = expected_heads()
+    async with engine.connect() as conn:
+        current = await current_revisions(conn)
+    if current != heads:
+        raise RuntimeError(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'} but this code "
+            f"expects {', '.join(sorted(heads))}; run `alembic upgrade head` (or set AUTO_CREATE_SCHEMA=true locally)"
+        )
+
+
+async def create_schema(engine):
+    """create_all for AUTO_CREATE_SCHEMA, stamping a fresh database with the head revision."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await ensure_search_index(conn)
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS alembic_version ("
+            "version_num VARCHAR(32) NOT NULL, CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))"
+        ))
+        if not await current_revisions(conn):
+            for head in expected_heads():
+                await conn.execute(text("INSERT INTO alembic_version (version_num) VALUES (:head)"), {"head": head})
@@ -0,0 +1,131 @@
+import re
+
+from sqlalchemy import Float, text
+
+from models.base_model import ID
+from services.pagination import decode_rank_cursor, encode_rank_cursor
+
+# A caption match counts this much more than a match in one of the comments
+CAPTION_WEIGHT = 2
+
+# Postgres: generated tsvector columns, maintained by the database itself
+POSTGRES_DDL = (
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(caption, ''))) STORED",
+    "ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_comments_search_vector ON comments USING gin (search_vector)",
+)
+
+# SQLite: one FTS5 table holding captions (comment_id NULL) and comments,
+# kept up to date by index_post/index_comment/unindex_comment
+SQLITE_DDL = "CREATE VIRTUAL TABLE search_index USING fts5(body, post_id UNINDEXED, comment_id UNINDEXED)"
+SQLITE_BACKFILL = (
+    "INSERT INTO search_index (body, post_id, comment_id) "
+    "SELECT caption, id, NULL FROM posts WHERE caption IS NOT NULL",
+    "INSERT INTO search_index (body, post_id, comment_id) "
+    "SELECT content, post_id, id FROM comments WHERE content IS NOT NULL",
+)
+
+POSTGRES_HITS = f"""
+    SELECT posts.id AS post_id, ts_rank(posts.search_vector, query) * {CAPTION_WEIGHT} AS score
+    FROM posts, websearch_to_tsquery('simple', :q) AS query
+    WHERE posts.search_vector @@ query
+    UNION ALL
+    SELECT comments.post_id, ts_rank(comments.search_vector, query)
+    FROM comments, websearch_to_tsquery('simple', :q) AS query
+    WHERE comments.search_vector @@ query
+"""
+
+# FTS5's rank (bm25) is lower for better matches, so it is negated to score like
+# ts_rank; bm25() itself cannot be called from a subquery that gets aggregated
+SQLITE_HITS = f"""
+    SELECT post_id, -search_index.rank * CASE WHEN comment_id IS NULL THEN {CAPTION_WEIGHT} ELSE 1 END AS score
+    FROM search_index
+    WHERE search_index MATCH :q
+"""
+
+
+def _dialect(db):
+    return db.get_bind().dialect.name
+
+
+def fts_query(q):
+    """User input as an FTS5 query: every word must match, operators are not interpreted."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in re.findall(r"\w+", q))
+
+
+async def ensure_search_index(conn):
+    """Create the search index when missing, for AUTO_CREATE_SCHEMA databases."""
+    if conn.dialect.name == "postgresql":
+        for ddl in POSTGRES_DDL:
+            await conn.execute(text(ddl))
+    elif conn.dialect.name == "sqlite":
+        exists = (await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+        )).first()
+        if not exists:
+            await conn.execute(text(SQLITE_DDL))
+            for backfill in SQLITE_BACKFILL:
+                await conn.execute(text(backfill))
+
+
+async def index_post(db, post_id, caption):
+    if _dialect(db) == "sqlite" and caption:
+        await db.execute(
+            text("INSERT INTO search_index (body, post_id, comment_id) VALUES (:body, :post_id, NULL)"),
+            {"body": caption, "post_id": post_id},
+        )
+
+
+async def index_comment(db, comment):
+    if _dialect(db) == "sqlite" and comment.content:
+        await db.execute(
+            text("INSERT INTO search_index (body, post_id, comment_id) VALUES (:body, :post_id, :comment_id)"),
+            {"body": comment.content, "post_id": comment.post_id, "comment_id": comment.id},
+        )
+
+
+async def unindex_comment(db, comment_id):
+    if _dialect(db) == "sqlite":
+        await db.execute(text("DELETE FROM search_index WHERE comment_id = :comment_id"),
+                         {"comment_id": comment_id})
+
+
+async def search_post_ids(db, q, cursor, limit):
+    """Ids of ready posts whose caption or comments match `q`, best first.
+
+    Each post is scored by its best hit, caption hits weighted by
+    CAPTION_WEIGHT. Pages are keyset paginated on (score, post id), which
+    keeps them stable while posts are added, but the cursor is a HAVING
+    filter: a post's score is only known once all its hits are grouped, so
+    every page scores the whole match set and costs about as much as the
+    number of hits of `q`. Returns (ids, next cursor).
+    """
+    hits = POSTGRES_HITS if _dialect(db) == "postgresql" else SQLITE_HITS
+    q = q if _dialect(db) == "postgresql" else fts_query(q)
+    if not q.strip():
+        return [], None
+
+    params = {"q": q, "limit": limit + 1}
+    after = ""
+    if cursor:
+        params["score"], params["id"] = decode_rank_cursor(cursor)
+        after = "HAVING max(hits.score) < :score OR (max(hits.score) = :score AND hits.post_id < :id)"
+
+    rows = (await db.execute(text(f"""
+        SELECT hits.post_id, max(hits.score) AS score
+        FROM ({hits}) AS hits
+        JOIN posts ON posts.id = hits.post_id AND posts.status = 'ready'
+        GROUP BY hits.post_id
+        {after}
+        ORDER BY score DESC, hits.post_id DESC
+        LIMIT :limit
+    """).columns(post_id=ID, score=Float), params)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1].score, rows[-1].post_id)
+    return [row.post_id for row in rows], next_cursor
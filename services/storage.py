@@ -0,0 +1,60 @@
+import os
+import shutil
+from urllib.parse import urljoin
+
+
+class StorageBackend:
+    """Where post images end up. `upload` is blocking and returns a public URL."""
+
+    def upload(self, path, folder):
+        raise NotImplementedError
+
+
+class CloudinaryStorage(StorageBackend):
+    def __init__(self):
+        import cloudinary
+
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            secure=True
+        )
+
+    def upload(self, path, folder):
+        import cloudinary.uploader
+
+        image_res = cloudinary.uploader.upload(path, resource_type="image", folder=folder)
+        return image_res["url"]
+
+
+class LocalStorage(StorageBackend):
+    """Stores images on the local filesystem; a stand-in for tests and local runs."""
+
+    def __init__(self, root=None, base_url=None):
+        self.root = root or os.getenv("LOCAL_STORAGE_DIR", "media")
+        self.base_url = base_url or os.getenv("LOCAL_STORAGE_URL", "/media/")
+
+    def upload(self, path, folder):
+        target_dir = os.path.join(self.root, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.copyfile(path, os.path.join(target_dir, "image"))
+        return urljoin(self.base_url, f"{folder}/image")
+
+
+BACKENDS = {
+    "cloudinary": CloudinaryStorage,
+    "local": LocalStorage,
+}
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        name = os.getenv("STORAGE_BACKEND", "cloudinary")
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+        _storage = BACKENDS[name]()
+    return _storage
@@ -0,0 +1,121 @@
+import os
+
+from sqlalchemy import delete, select, update
+
+from models.follow_model import FollowModel
+from models.post_model import Post
+from models.timeline_model import TimelineModel
+from models.user_model import UserModel
+from services.fanout import FANOUT_MAX_FOLLOWERS, insert_timeline_rows, is_celebrity
+from services.pagination import ID_ORDERED_FEED, encode_cursor, encode_id_cursor, feed_page
+from services.toggles import upsert_insert
+
+# Recent posts copied into a timeline when its owner starts following someone
+FOLLOW_BACKFILL_SIZE = int(os.getenv("FOLLOW_BACKFILL_SIZE", "50"))
+
+
+async def toggle_follow(db, follower_id, followee_id):
+    """Follow `followee_id`, or unfollow when already following. Returns the new state."""
+    unfollowed = (await db.execute(
+        delete(FollowModel)
+        .where(FollowModel.follower_id == follower_id, FollowModel.followee_id == followee_id)
+        .returning(FollowModel.followee_id)
+    )).first()
+
+    if unfollowed:
+        await _adjust_counts(db, follower_id, followee_id, -1)
+        await db.execute(delete(TimelineModel).where(
+            TimelineModel.user_id == follower_id, TimelineModel.author_id == followee_id
+        ))
+        await db.commit()
+        return False
+
+    followed = (await db.execute(
+        upsert_insert(db, FollowModel)
+        .values(follower_id=follower_id, followee_id=followee_id)
+        .on_conflict_do_nothing(index_elements=["follower_id", "followee_id"])
+        .returning(FollowModel.followee_id)
+    )).first()
+
+    if followed:
+        await _adjust_counts(db, follower_id, followee_id, 1)
+        followers_count = (await db.execute(
+            select(UserModel.followers_count).where(UserModel.id == followee_id)
+        )).scalar_one()
+
+        # Celebrities are read on demand, everyone else is materialized now
+        if not is_celebrity(followers_count):
+            recent = (await db.execute(
+                select(Post.id, Post.created_at)
+                .where(Post.user_id == followee_id, Post.status == "ready")
+                .order_by(Post.created_at.desc(), Post.id.desc())
+                .limit(FOLLOW_BACKFILL_SIZE)
+            )).all()
+            await insert_timeline_rows(db, [{
+                "user_id": follower_id, "post_id": post_id,
+                "author_id": followee_id, "created_at": created_at
+            } for post_id, created_at in recent])
+
+    await db.commit()
+    return True
+
+
+async def _adjust_counts(db, follower_id, followee_id, delta):
+    await db.execute(
+        update(UserModel).where(UserModel.id == followee_id)
+        .values(followers_count=UserModel.followers_count + delta)
+    )
+    await db.execute(
+        update(UserModel).where(UserModel.id == follower_id)
+        .values(following_count=UserModel.following_count + delta)
+    )
+
+
+async def home_timeline_ids(db, user_id, cursor, limit):
+    """Post ids of one page of `user_id`'s home timeline, and the next cursor.
+
+    Materialized entries are a single range scan on
+    timelines(user_id, created_at, post_id), or on its primary key
+    (user_id, post_id) with ID_ORDERED_FEED. Posts of followed accounts above
+    FANOUT_MAX_FOLLOWERS were never fanned out, so their latest posts are
+    fetched with the same keyset and merged in.
+    """
+    entries, next_cursor = await feed_page(
+        db,
+        select(TimelineModel.post_id, TimelineModel.created_at).where(TimelineModel.user_id == user_id),
+        TimelineModel.created_at, TimelineModel.post_id, cursor, limit,
+        key=lambda entry: (entry.created_at, entry.post_id),
+    )
+    merged = {entry.post_id: entry.created_at for entry in entries}
+    has_more = next_cursor is not None
+
+    celebrities = select(FollowModel.followee_id).join(
+        UserModel, UserModel.id == FollowModel.followee_id
+    ).where(FollowModel.follower_id == user_id, UserModel.followers_count > FANOUT_MAX_FOLLOWERS)
+
+    posts, celebrity_cursor = await feed_page(
+        db,
+        select(Post.id, Post.created_at).where(Post.user_id.in_(celebrities), Post.status == "ready"),
+        Post.created_at, Post.id, cursor, limit,
+        key=lambda post: (post.created_at, post.id),
+    )
+    if posts:
+        merged.update((post.id, post.created_at) for post in posts)
+        has_more = has_more or celebrity_cursor is not None
+
+        # Both sources are sorted and cut at `limit`, so the top of the union is exact
+        if ID_ORDERED_FEED:
+            ordered = sorted(merged.items(), reverse=True)
+        else:
+            ordered = sorted(merged.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        has_more = has_more or len(ordered) > limit
+        ordered = ordered[:limit]
+        if not has_more:
+            next_cursor = None
+        elif ID_ORDERED_FEED:
+            next_cursor = encode_id_cursor(ordered[-1][0])
+        else:
+            next_cursor = encode_cursor(ordered[-1][1], ordered[-1][0])
+        return [post_id for post_id, _ in ordered], next_cursor
+
+    return list(merged), next_cursor
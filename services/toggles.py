@@ -0,0 +1,134 @@
+import os
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.post_model import Post
+from services.counters import increment, increment_many
+from services.ids import is_id, new_id
+
+# Maximum number of items accepted by one batch toggle request
+BATCH_TOGGLE_LIMIT = int(os.getenv("BATCH_TOGGLE_LIMIT", "200"))
+
+
+def upsert_insert(db, model):
+    """Dialect specific INSERT that supports `ON CONFLICT DO NOTHING`."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+async def toggle(db, model, counter, post_id, user_id):
+    """Flip the (user_id, post_id) row of a like/save table.
+
+    Unliking is a single `DELETE ... RETURNING`. When nothing was deleted the
+    row is inserted with `ON CONFLICT DO NOTHING` against the unique
+    (user_id, post_id) index, so two racing requests can never create a
+    duplicate or count it twice. Returns the new state (True when the row
+    exists afterwards); an unknown post is a 404.
+    """
+    deleted = (await db.execute(
+        delete(model)
+        .where(model.user_id == user_id, model.post_id == post_id)
+        .returning(model.id)
+    )).first()
+
+    if deleted:
+        await increment(db, post_id, counter, -1)
+        await db.commit()
+        return False
+
+    # Only a new row needs the post; a dangling one would count nowhere
+    if (await db.execute(select(Post.id).where(Post.id == post_id))).first() is None:
+        raise HTTPException(status_code=404, detail="Post not found!")
+
+    inserted = (await db.execute(
+        upsert_insert(db, model)
+        .values(id=new_id(), post_id=post_id, user_id=user_id)
+        .on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+        .returning(model.id)
+    )).first()
+
+    # Lost the race against a concurrent toggle: the row exists either way
+    if inserted:
+        await increment(db, post_id, counter)
+    await db.commit()
+    return True
+
+
+async def apply_toggles(db, model, counter, adds, removes):
+    """Insert the `adds` and delete the `removes` of a like/save table in one transaction.
+
+    Both are collections of (user_id, post_id) pairs. Removals are one
+    `DELETE ... WHERE (user_id, post_id) IN (...) RETURNING`, additions one
+    multi-row `INSERT ... ON CONFLICT DO NOTHING RETURNING`, and the counters
+    of every touched post are adjusted by a single UPDATE. Only rows that
+    really changed are counted. Returns the sets of pairs added and removed.
+    """
+    removed = set()
+    if removes:
+        rows = await db.execute(
+            delete(model)
+            .where(tuple_(model.user_id, model.post_id).in_(list(removes)))
+            .returning(model.user_id, model.post_id)
+            .execution_options(synchronize_session=False)
+        )
+        removed = {tuple(row) for row in rows}
+
+    added = set()
+    if adds:
+        rows = await db.execute(
+            upsert_insert(db, model)
+            .values([{"id": new_id(), "user_id": user_id, "post_id": post_id}
+                     for user_id, post_id in adds])
+            .on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+            .returning(model.user_id, model.post_id)
+        )
+        added = {tuple(row) for row in rows}
+
+    deltas = Counter(post_id for _, post_id in added)
+    deltas.subtract(post_id for _, post_id in removed)
+    await increment_many(db, counter, deltas)
+
+    await db.commit()
+    return added, removed
+
+
+async def batch_toggle(db, model, counter, user_id, items):
+    """Apply a client's queued like/save actions, returning one result per item.
+
+    `items` are (post_id, action) pairs with action "add" or "remove".
+    Actions are idempotent, so replaying a sync is harmless; when a post
+    appears more than once the last action wins. Unknown posts are reported
+    per item instead of failing the whole batch.
+    """
+    final = {post_id: action for post_id, action in items}
+    last_index = {post_id: index for index, (post_id, _) in enumerate(items)}
+    # A malformed id is just another unknown post, not an error for the whole batch
+    candidates = [post_id for post_id in final if is_id(post_id)]
+    existing = set((await db.execute(
+        select(Post.id).where(Post.id.in_(candidates))
+    )).scalars().all()) if candidates else set()
+
+    adds = {(user_id, post_id) for post_id, action in final.items() if post_id in existing and action == "add"}
+    removes = {(user_id, post_id) for post_id, action in final.items() if post_id in existing and action == "remove"}
+    added, removed = await apply_toggles(db, model, counter, adds, removes)
+    changed = {post_id for _, post_id in added | removed}
+
+    results = []
+    for index, (post_id, action) in enumerate(items):
+        if post_id not in existing:
+            results.append({"post_id": post_id, "action": action, "message": None,
+                            "changed": False, "error": "Post not found"})
+            continue
+        # Earlier duplicates report the outcome of the action that won
+        results.append({
+            "post_id": post_id,
+            "action": action,
+            "message": final[post_id] == "add",
+            "changed": index == last_index[post_id] and post_id in changed,
+        })
+
+    return results, changed
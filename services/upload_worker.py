@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, or_, select, true, union, update
+
+from models.liked_model import LikedModel
+from models.post_model import Post
+from models.saved_model import SavedModel
+from services.fanout import fanout_worker
+from services.feed_cache import feed_cache
+from services.search import index_post
+from services.storage import get_storage
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "100"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+UPLOAD_RETRY_DELAY = float(os.getenv("UPLOAD_RETRY_DELAY", "1"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "spool")
+# Recorded on every pending post; only this host can tell whether its spool file is gone
+UPLOAD_HOST = os.getenv("UPLOAD_HOST", socket.gethostname())
+# Set when every host mounts the same UPLOAD_SPOOL_DIR, so any of them can retry any post
+UPLOAD_SHARED_SPOOL = os.getenv("UPLOAD_SHARED_SPOOL", "false").lower() == "true"
+# A pending post whose claim is older than this was abandoned by a dead process
+UPLOAD_STALE_SECONDS = float(os.getenv("UPLOAD_STALE_SECONDS", "600"))
+# How often every process looks for abandoned or released pending posts
+UPLOAD_SWEEP_INTERVAL = float(os.getenv("UPLOAD_SWEEP_INTERVAL", "60"))
+
+
+class UploadQueueFull(Exception):
+    pass
+
+
+class UploadWorker:
+    """Pushes spooled images to the storage backend in the background.
+
+    A post is committed as `pending` and claimed by the process that created
+    it, with its image spooled to UPLOAD_SPOOL_DIR/<post_id>. Up to
+    UPLOAD_WORKERS uploads run at once on their own threads; a failed upload
+    is retried with exponential backoff before the post is marked `failed`.
+
+    Every UPLOAD_SWEEP_INTERVAL seconds each process claims pending posts
+    whose claim is older than UPLOAD_STALE_SECONDS, or was released by a
+    process shutting down, with one conditional UPDATE, so a post is only
+    ever picked up by one of them. The spool is local to a host, so only
+    posts spooled on this host (UPLOAD_HOST) are swept, unless
+    UPLOAD_SHARED_SPOOL says every host sees the same files; a post whose
+    file is gone is then marked `failed`. Posts from before `spool_host`
+    was recorded are swept by any host.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+        self.executor = None
+        self.tasks = []
+        self.active = set()
+        self.session_factory = None
+
+    def spool_path(self, post_id):
+        return os.path.join(UPLOAD_SPOOL_DIR, post_id)
+
+    def spool(self, source, post_id):
+        """Copy an uploaded file into the spool. Blocking: run it in a thread."""
+        with open(self.spool_path(post_id), "wb") as spool:
+            shutil.copyfileobj(source, spool)
+
+    def discard(self, post_id):
+        """Remove a spooled file, if any. Blocking: run it in a thread."""
+        try:
+            os.remove(self.spool_path(post_id))
+        except FileNotFoundError:
+            pass
+
+    def full(self):
+        return self.queue.full()
+
+    def submit(self, post_id):
+        try:
+            self.queue.put_nowait(post_id)
+        except asyncio.QueueFull:
+            raise UploadQueueFull()
+
+    async def start(self, session_factory):
+        os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+        self.session_factory = session_factory
+        self.executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+        self.tasks = [asyncio.create_task(self._run()) for _ in range(UPLOAD_WORKERS)]
+        self.tasks.append(asyncio.create_task(self._sweep_forever()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+        # Hand queued and interrupted uploads to the next sweep of any process
+        unfinished = self.active | {self.queue.get_nowait() for _ in range(self.queue.qsize())}
+        self.active = set()
+        if unfinished and self.session_factory is not None:
+            try:
+                await self._release(unfinished)
+            except Exception:
+                logging.error("Releasing unfinished uploads failed; they are retried once stale",
+                              exc_info=True)
+
+    async def _release(self, post_ids):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Post)
+                .where(Post.id.in_(list(post_ids)), Post.status == "pending")
+                .values(claimed_at=None, updated_at=Post.updated_at)
+            )
+            await db.commit()
+        logging.info(f"Released {len(post_ids)} unfinished uploads")
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logging.error("Sweeping pending uploads failed", exc_info=True)
+            await asyncio.sleep(UPLOAD_SWEEP_INTERVAL)
+
+    async def sweep(self):
+        """Claim abandoned pending posts and retry them if their spool survived."""
+        free = self.queue.maxsize - self.queue.qsize()
+        if free <= 0:
+            return
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=UPLOAD_STALE_SECONDS)
+        # A missing file on another host's disk says nothing about the upload
+        spooled_here = true() if UPLOAD_SHARED_SPOOL else or_(Post.spool_host == UPLOAD_HOST,
+                                                               Post.spool_host.is_(None))
+        abandoned = (
+            select(Post.id)
+            .where(Post.status == "pending", func.coalesce(Post.claimed_at, stale_before) <= stale_before,
+                   spooled_here)
+            .limit(free)
+        )
+        async with self.session_factory() as db:
+            # The claim is re-checked row by row, so concurrent sweeps never share a post
+            claimed = (await db.execute(
+                update(Post)
+                .where(Post.id.in_(abandoned.scalar_subquery()), Post.status == "pending",
+                       func.coalesce(Post.claimed_at, stale_before) <= stale_before, spooled_here)
+                .values(claimed_at=now, updated_at=Post.updated_at)
+                .returning(Post.id)
+            )).scalars().all()
+            await db.commit()
+
+        for post_id in claimed:
+            if os.path.exists(self.spool_path(post_id)):
+                await self.queue.put(post_id)
+            else:
+                await self._finish(post_id, "failed")
+
+    async def _run(self):
+        while True:
+            post_id = await self.queue.get()
+            self.active.add(post_id)
+            try:
+                await self._upload(post_id)
+            except Exception:
+                logging.error(f"Upload of post {post_id} crashed", exc_info=True)
+            finally:
+                self.queue.task_done()
+            # Left in place when cancelled, so stop() can release the post
+            self.active.discard(post_id)
+
+    async def _upload(self, post_id):
+        path = self.spool_path(post_id)
+        loop = asyncio.get_running_loop()
+        storage = get_storage()
+
+        url = None
+        for attempt in range(UPLOAD_RETRIES + 1):
+            try:
+                url = await loop.run_in_executor(self.executor, storage.upload, path, f"posts/{post_id}")
+                break
+            except Exception:
+                logging.warning(f"Upload of post {post_id} failed (attempt {attempt + 1})", exc_info=True)
+                if attempt < UPLOAD_RETRIES:
+                    await asyncio.sleep(UPLOAD_RETRY_DELAY * 2 ** attempt)
+
+        await self._finish(post_id, "ready" if url else "failed", url)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def _finish(self, post_id, status, image_url=None):
+        async with self.session_factory() as db:
+            # Only a pending post: one finished or deleted meanwhile is left as it is
+            row = (await db.execute(
+                update(Post)
+                .where(Post.id == post_id, Post.status == "pending")
+                .values(status=status, image_url=image_url, updated_at=Post.updated_at)
+                .returning(Post.caption, Post.user_id)
+            )).first()
+            if row is None:
+                logging.warning(f"Post {post_id} is no longer pending, not marking it {status}")
+                return
+            users = []
+            if status == "ready":
+                await index_post(db, post_id, row.caption)
+                # Whoever liked or saved it while pending now sees it in their lists
+                users = (await db.execute(union(
+                    select(LikedModel.user_id).where(LikedModel.post_id == post_id),
+                    select(SavedModel.user_id).where(SavedModel.post_id == post_id),
+                ))).scalars().all()
+            await db.commit()
+        logging.info(f"Post {post_id} is {status}")
+
+        # The post only shows up in feeds and timelines once it is ready
+        if status == "ready":
+            await feed_cache.invalidate_pages()
+            # The author's posts_count on /auth/me, and the lists of early likers
+            await feed_cache.bump(*{f"user:{user_id}" for user_id in [row.user_id, *users]})
+            await fanout_worker.submit(post_id)
+
+
+upload_worker = UploadWorker()
@@ -0,0 +1,33 @@
+from sqlalchemy import literal, select, union_all
+
+from models.liked_model import LikedModel
+from models.saved_model import SavedModel
+
+
+async def get_viewer_state(db, user_id, post_ids):
+    """Resolve which of `post_ids` the viewer has liked and saved.
+
+    Both relations are answered by one `UNION ALL` query filtered by
+    `user_id` and `post_id IN (...)`, so the cost depends on the page size
+    only, not on how many likes or saves the posts have. Returns a pair of
+    sets `(liked_ids, saved_ids)`.
+    """
+    liked_ids, saved_ids = set(), set()
+    if not post_ids:
+        return liked_ids, saved_ids
+
+    post_ids = list(post_ids)
+    query = union_all(
+        select(literal("liked").label("kind"), LikedModel.post_id)
+        .where(LikedModel.user_id == user_id, LikedModel.post_id.in_(post_ids)),
+        select(literal("saved").label("kind"), SavedModel.post_id)
+        .where(SavedModel.user_id == user_id, SavedModel.post_id.in_(post_ids)),
+    )
+
+    for kind, post_id in await db.execute(query):
+        if kind == "liked":
+            liked_ids.add(post_id)
+        else:
+            saved_ids.add(post_id)
+
+    return liked_ids, saved_ids
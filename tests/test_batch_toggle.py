@@ -0,0 +1,51 @@
+from services.ids import new_id
+from services.toggles import BATCH_TOGGLE_LIMIT
+
+
+def save_batch(client, user, items):
+    return client.post("/post/saved/batch", json={"items": items}, headers=user["headers"])
+
+
+def saved_ids(client, user):
+    return {post["id"] for post in client.get("/post/list/saved", headers=user["headers"]).json()}
+
+
+def test_ids_are_matched_in_any_uuid_spelling(client, user, seed_posts):
+    upper, bare = seed_posts(user["id"], 2)
+
+    response = save_batch(client, user, [{"post_id": upper.upper(), "action": "add"},
+                                         {"post_id": bare.replace("-", ""), "action": "add"}])
+    assert response.status_code == 200
+    assert [(item["post_id"], item["changed"]) for item in response.json()] == [(upper, True), (bare, True)]
+    assert saved_ids(client, user) == {upper, bare}
+
+
+def test_unknown_ids_fail_per_item(client, user, seed_posts):
+    known, = seed_posts(user["id"], 1)
+    unknown = new_id()
+
+    response = save_batch(client, user, [
+        {"post_id": unknown, "action": "add"},
+        {"post_id": known, "action": "remove"},
+        {"post_id": "not-an-id", "action": "add"},
+        # The last action on a post wins
+        {"post_id": known, "action": "add"},
+    ])
+    assert response.status_code == 200
+    assert [(item["message"], item["changed"], item["error"]) for item in response.json()] == [
+        (None, False, "Post not found"),
+        (True, False, None),
+        (None, False, "Post not found"),
+        (True, True, None),
+    ]
+    assert saved_ids(client, user) == {known}
+
+
+def test_item_limit_is_enforced_by_the_schema(client, user, seed_posts):
+    post_id, = seed_posts(user["id"], 1)
+    items = [{"post_id": post_id, "action": "add"}] * BATCH_TOGGLE_LIMIT
+
+    assert save_batch(client, user, items).status_code == 200
+    assert save_batch(client, user, items + [{"post_id": post_id, "action": "remove"}]).status_code == 422
+    # Nothing of the rejected batch was applied
+    assert saved_ids(client, user) == {post_id}
@@ -0,0 +1,16 @@
+from services.ids import new_id
+
+
+def test_comment_on_unknown_post_is_404(client, user):
+    response = client.post("/post/comments", json={"post_id": new_id(), "content": "hello"},
+                           headers=user["headers"])
+    assert response.status_code == 404
+
+
+def test_comment_counts_on_its_post(client, user, seed_posts):
+    post_id, = seed_posts(user["id"], 1)
+
+    response = client.post("/post/comments", json={"post_id": post_id, "content": "hello"},
+                           headers=user["headers"])
+    assert response.status_code == 200
+    assert client.get("/post/list", headers=user["headers"]).json()[0]["comments_count"] == 3
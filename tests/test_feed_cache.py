@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from services.feed_cache import FeedCache, MemoryBackend, RedisBackend
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis()
+    yield RedisBackend(client)
+    await client.aclose()
+
+
+async def test_redis_values_round_trip_and_expire(redis_backend):
+    await redis_backend.set_many({"post:a": {"id": "a", "likes_count": 2}, "post:b": [1, 2]}, ttl=0.05)
+    assert await redis_backend.get_many(["post:a", "post:b", "post:c"]) == [
+        {"id": "a", "likes_count": 2}, [1, 2], None,
+    ]
+
+    await redis_backend.delete("post:a")
+    assert await redis_backend.get_many(["post:a"]) == [None]
+
+    await asyncio.sleep(0.1)
+    assert await redis_backend.get_many(["post:b"]) == [None]
+
+
+async def test_redis_counters(redis_backend):
+    assert await redis_backend.get_counter("version:feed") == 0
+    assert await redis_backend.incr("version:feed") == 1
+    assert await redis_backend.incr("version:feed") == 2
+    assert await redis_backend.get_counters(["version:feed", "version:user:1"]) == [2, 0]
+
+
+async def test_feed_cache_pages_on_redis(redis_backend):
+    cache = FeedCache(redis_backend)
+    key, page = await cache.get_page(None, 20)
+    assert page is None
+    await cache.set_page(key, ["b", "a"], "cursor")
+    assert (await cache.get_page(None, 20))[1] == {"ids": ["b", "a"], "next_cursor": "cursor"}
+
+    # A new post orphans every cached page
+    await cache.invalidate_pages()
+    assert (await cache.get_page(None, 20))[1] is None
+
+
+async def test_memory_counters_are_bounded():
+    backend = MemoryBackend(maxsize=2, ttl=30)
+    for user_id in range(10):
+        await backend.incr(f"version:user:{user_id}")
+    assert len(backend.counters) == 2
+
+
+async def test_evicted_memory_counter_reads_as_changed():
+    backend = MemoryBackend(maxsize=2, ttl=30)
+    seen = await backend.incr("version:user:1")
+    await backend.incr("version:user:2")
+    await backend.incr("version:user:3")
+
+    # Evicted: back with a version no client can hold, and stable until the next bump
+    fresh = await backend.get_counter("version:user:1")
+    assert fresh > seen
+    assert await backend.get_counter("version:user:1") == fresh
@@ -0,0 +1,20 @@
+def test_feed_etag_follows_the_posts_on_the_page(client, user, make_user, seed_posts):
+    newest, older = seed_posts(user["id"], 2)
+    other = make_user("other")
+
+    def first_page(etag=None):
+        headers = {**user["headers"], **({"If-None-Match": etag} if etag else {})}
+        return client.get("/post/list?limit=1", headers=headers)
+
+    etag = first_page().headers["etag"]
+
+    # Someone else's like on a post further down leaves the first page as it was
+    client.post("/post/liked", json={"post_id": older}, headers=other["headers"])
+    client.post("/post/comments", json={"post_id": older, "content": "hi"}, headers=other["headers"])
+    assert first_page(etag).status_code == 304
+
+    # A like on the post the page shows changes it
+    client.post("/post/liked", json={"post_id": newest}, headers=other["headers"])
+    response = first_page(etag)
+    assert response.status_code == 200
+    assert response.json()[0]["likes_count"] == 2
@@ -0,0 +1,95 @@
+import pytest
+
+from services import like_buffer as like_buffer_module
+from services.like_buffer import like_buffer
+
+
+@pytest.fixture
+def buffered(client, monkeypatch):
+    """Likes go through the write-behind buffer, flushed only when a test says so."""
+    monkeypatch.setattr(like_buffer, "enabled", True)
+    return lambda: client.portal.call(like_buffer.flush)
+
+
+@pytest.fixture
+def posts(make_user, seed_posts):
+    """Two posts of another user, each liked once by that user."""
+    return seed_posts(make_user("author")["id"], 2)
+
+
+def like(client, user, post_id):
+    return client.post("/post/liked", json={"post_id": post_id}, headers=user["headers"]).json()["message"]
+
+
+def liked_count(client, user):
+    return client.get("/auth/me", headers=user["headers"]).json()["liked_count"]
+
+
+def liked_list(client, user):
+    return [post["id"] for post in client.get("/post/list/liked", headers=user["headers"]).json()]
+
+
+def likes_counts(client, user):
+    return {post["id"]: post["likes_count"] for post in client.get("/post/list", headers=user["headers"]).json()}
+
+
+def test_own_count_and_list_include_buffered_likes(client, user, posts, buffered):
+    newest, older = posts
+    assert like(client, user, older) is True
+    assert like(client, user, newest) is True
+
+    # Nothing written yet, but the user already sees both, most recent first
+    assert like_buffer.snapshot()["pending"] == 2
+    assert liked_count(client, user) == 2
+    assert liked_list(client, user) == [newest, older]
+    assert likes_counts(client, user) == {newest: 2, older: 2}
+
+    buffered()
+    assert like_buffer.snapshot()["pending"] == 0
+    assert liked_count(client, user) == 2
+    assert set(liked_list(client, user)) == {newest, older}
+    assert likes_counts(client, user) == {newest: 2, older: 2}
+
+    # Taken back but not flushed yet: gone from the count and the list
+    assert like(client, user, older) is False
+    assert liked_count(client, user) == 1
+    assert liked_list(client, user) == [newest]
+    assert likes_counts(client, user) == {newest: 2, older: 1}
+
+
+def test_opposite_toggles_cancel_out(client, user, posts, buffered):
+    newest, _ = posts
+    assert like(client, user, newest) is True
+    assert like(client, user, newest) is False
+
+    assert like_buffer.snapshot()["pending"] == 0
+    buffered()
+    assert like_buffer.snapshot()["flushed_rows"] == 0
+    assert liked_count(client, user) == 0
+    assert likes_counts(client, user)[newest] == 1
+
+
+def test_failed_flush_is_merged_back_under_newer_toggles(client, user, posts, buffered, monkeypatch):
+    newest, older = posts
+    like(client, user, newest)
+    like(client, user, older)
+
+    async def failing_apply(db, *args):
+        # The user takes one like back while the batch is being written
+        await like_buffer.toggle(db, user["id"], newest)
+        raise RuntimeError("database went away")
+
+    with monkeypatch.context() as patch, pytest.raises(RuntimeError):
+        patch.setattr(like_buffer_module, "apply_toggles", failing_apply)
+        buffered()
+
+    # The database still has neither like: the take-back cancels its like, the other one waits
+    assert like_buffer.snapshot()["pending"] == 1
+    assert like_buffer.likes_delta(newest) == 0 and like_buffer.likes_delta(older) == 1
+    assert liked_count(client, user) == 1
+    assert liked_list(client, user) == [older]
+
+    buffered()
+    assert like_buffer.snapshot()["pending"] == 0
+    assert liked_count(client, user) == 1
+    assert likes_counts(client, user) == {newest: 1, older: 2}
@@ -0,0 +1,24 @@
+from services.feed_cache import NullBackend, feed_cache
+
+
+def test_feed_query_count_does_not_grow_with_the_page(client, user, seed_posts, query_budget, monkeypatch):
+    seed_posts(user["id"], 30)
+    # Every page is read from the database, not from what an earlier one cached
+    monkeypatch.setattr(feed_cache, "backend", NullBackend())
+
+    small = client.get("/post/list?limit=5", headers=user["headers"])
+    large = client.get("/post/list?limit=25", headers=user["headers"])
+    assert len(small.json()) == 5 and len(large.json()) == 25
+
+    # Page ids, post rows, comment previews and the viewer's flags, whatever the page size
+    query_budget(small, statements=4)
+    query_budget(large, statements=4)
+
+
+def test_liked_list_query_count(client, user, seed_posts, query_budget):
+    seed_posts(user["id"], 10)
+
+    response = client.get("/post/list/liked", headers=user["headers"])
+    assert len(response.json()) == 10
+    # The page with its posts, then the viewer's flags
+    query_budget(response, statements=2)
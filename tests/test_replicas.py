@@ -0,0 +1,38 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from models.base_model import Base
+from services import replicas as replicas_module
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """An empty read replica, and a short read-your-writes window. Request it before `client`."""
+    import main  # noqa: F401  (every model registered on Base)
+
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    monkeypatch.setenv("REPLICA_URLS", url)
+    monkeypatch.setattr(replicas_module, "READ_YOUR_WRITES_WINDOW", 0.5)
+    return url
+
+
+def test_reads_stay_on_the_primary_right_after_a_write(replica, client, user, seed_posts):
+    assert replicas_module.replicas.snapshot()["healthy"] == 1
+    post_id, = seed_posts(user["id"], 1)
+
+    def comments():
+        return client.get(f"/post/{post_id}/comments", headers=user["headers"]).json()
+
+    # The replica has none of this data, so whatever is found was read from the primary
+    client.post("/post/comments", json={"post_id": post_id, "content": "first"}, headers=user["headers"])
+    assert {comment["content"] for comment in comments()} == {"first", "comment 0", "comment 1"}
+
+    # Once the window is over the session reads from the replica again
+    time.sleep(0.6)
+    assert comments() == []
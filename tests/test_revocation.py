@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from sqlalchemy import insert
+
+from db import SessionLocal
+from models.revoked_token_model import RevokedTokenModel
+from services.revocation import revocations
+
+
+def me(client, user):
+    return client.get("/auth/me", headers=user["headers"]).status_code
+
+
+def jti_of(user):
+    return jwt.decode(user["headers"]["x-auth-token"], options={"verify_signature": False})["jti"]
+
+
+def revoke_elsewhere(client, jti, created_at=None):
+    """A revocation written by another worker, which this one has not seen."""
+    row = {"jti": jti, "expires_at": datetime.now(timezone.utc) + timedelta(days=1)}
+    if created_at is not None:
+        row["created_at"] = created_at
+
+    async def insert_row():
+        async with SessionLocal() as db:
+            await db.execute(insert(RevokedTokenModel), [row])
+            await db.commit()
+
+    client.portal.call(insert_row)
+
+
+def test_signed_out_token_is_rejected_even_when_cached(client, user):
+    # The first request puts the verified token in the token cache
+    assert me(client, user) == 200
+    assert client.post("/auth/signout", headers=user["headers"]).status_code == 200
+    assert me(client, user) == 401
+
+
+def test_revocation_on_another_worker_applies_after_refresh(client, user):
+    assert me(client, user) == 200
+    revoke_elsewhere(client, jti_of(user))
+
+    client.portal.call(revocations.refresh, SessionLocal)
+    assert me(client, user) == 401
+
+
+def test_bloom_false_positive_falls_back_to_the_database(client, user):
+    # In the filter without a revoked_tokens row, as a false positive would be
+    revocations.bloom.add(jti_of(user))
+    assert me(client, user) == 200
+    assert revocations.confirmed.get(jti_of(user)) is False
+
+
+def test_refresh_picks_up_a_revocation_that_committed_late(client, user, make_user):
+    other = make_user("other")
+    now = datetime.now(timezone.utc)
+    revoke_elsewhere(client, "some-newer-token", created_at=now)
+    client.portal.call(revocations.refresh, SessionLocal)
+
+    # Its transaction started before the row already seen, but committed after the refresh
+    revoke_elsewhere(client, jti_of(other), created_at=now - timedelta(seconds=5))
+    client.portal.call(revocations.refresh, SessionLocal)
+    assert me(client, other) == 401
+    assert me(client, user) == 200
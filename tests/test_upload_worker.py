@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from db import SessionLocal
+from models.post_model import Post
+from services.ids import new_id
+from services.upload_worker import UPLOAD_HOST, upload_worker
+
+
+def add_post(client, user_id, **values):
+    post = {"id": new_id(), "user_id": user_id, "caption": "pending", "status": "pending",
+            "claimed_at": datetime.now(timezone.utc) - timedelta(days=1), **values}
+
+    async def insert_row():
+        async with SessionLocal() as db:
+            await db.execute(insert(Post), [post])
+            await db.commit()
+
+    client.portal.call(insert_row)
+    return post["id"]
+
+
+def status_of(client, post_id):
+    async def read():
+        async with SessionLocal() as db:
+            return (await db.execute(select(Post.status).where(Post.id == post_id))).scalar_one()
+
+    return client.portal.call(read)
+
+
+def test_sweep_fails_a_lost_upload_spooled_on_this_host(client, user):
+    post_id = add_post(client, user["id"], spool_host=UPLOAD_HOST)
+
+    client.portal.call(upload_worker.sweep)
+    assert status_of(client, post_id) == "failed"
+
+
+def test_sweep_leaves_uploads_spooled_on_other_hosts(client, user):
+    post_id = add_post(client, user["id"], spool_host="another-host")
+
+    client.portal.call(upload_worker.sweep)
+    assert status_of(client, post_id) == "pending"
+
+
+def test_finish_does_not_overwrite_a_finished_post(client, user):
+    post_id = add_post(client, user["id"], status="ready", image_url="/media/done.jpg")
+
+    client.portal.call(upload_worker._finish, post_id, "failed")
+    assert status_of(client, post_id) == "ready"